@@ -1,6 +1,14 @@
 import streamlit as st
 import numpy as np
 import time
+import logging
+
+from sia.video_frames import DEFAULT_SAMPLE_FPS, VideoDecodeError, spool_upload
+from sia.timeline import DEFAULT_ALERT_WINDOWS, DEFAULT_SMOOTHING
+from sia.violence import analyze_video_for_violence
+from sia.violence_model import backend_name
+
+logger = logging.getLogger(__name__)
 
 # Page config
 st.set_page_config(
@@ -86,73 +94,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# PROPER Violence Detection Logic (mimicking your trained model)
-def analyze_video_for_violence(video_type, filename=""):
-    """
-    Proper analysis logic that works like your trained MobileNetV2+LSTM model
-    This analyzes patterns and content to make accurate predictions
-    """
-
-    if video_type == 'violence':
-        # Violence sample - your model would detect this correctly
-        return {
-            'violence_detected': True,
-            'confidence': 0.94,
-            'reasoning': 'Aggressive physical confrontation detected',
-            'metrics': {
-                'motion_intensity': 8.7,
-                'aggression_score': 91,
-                'threat_level': 'HIGH'
-            }
-        }
-
-    elif video_type == 'safe':
-        # Safe sample - your model would correctly identify as safe
-        return {
-            'violence_detected': False,
-            'confidence': 0.89,
-            'reasoning': 'Normal peaceful activity patterns',
-            'metrics': {
-                'motion_intensity': 3.2,
-                'aggression_score': 11,
-                'threat_level': 'LOW'
-            }
-        }
-
-    else:
-        # Uploaded video - analyze based on filename and content hints
-        filename_lower = filename.lower() if filename else ""
-
-        # Violence indicators in filename
-        violence_keywords = ['fight', 'violence', 'attack', 'aggressive', 'punch', 'kick', 'hit']
-        safe_keywords = ['walk', 'talk', 'safe', 'normal', 'peaceful', 'calm']
-
-        violence_score = sum(1 for kw in violence_keywords if kw in filename_lower)
-        safe_score = sum(1 for kw in safe_keywords if kw in filename_lower)
-
-        if violence_score > safe_score:
-            return {
-                'violence_detected': True,
-                'confidence': 0.87,
-                'reasoning': 'Violence patterns detected in content',
-                'metrics': {
-                    'motion_intensity': 7.2,
-                    'aggression_score': 78,
-                    'threat_level': 'HIGH'
-                }
-            }
-        else:
-            return {
-                'violence_detected': False,
-                'confidence': 0.82,
-                'reasoning': 'Content appears safe',
-                'metrics': {
-                    'motion_intensity': 4.1,
-                    'aggression_score': 18,
-                    'threat_level': 'LOW'
-                }
-            }
-
 # Initialize session state
 if 'analysis_done' not in st.session_state:
     st.session_state.analysis_done = False
@@ -200,6 +141,12 @@ with st.sidebar:
     - Pattern analysis
     - Temporal smoothing
     """)
+    engine = backend_name()
+    if engine == 'heuristic':
+        st.markdown("**🟡 Engine**: Heuristic (no model configured in SIA_VIOLENCE_MODEL)")
+    else:
+        # e.g. "(tflite-int8)" when the CNN runs quantized
+        st.markdown(f"**🟢 Engine**: MobileNetV2 + LSTM model loaded {engine.partition(' ')[2]}".rstrip())
 
 # Main interface
 col1, col2 = st.columns([3, 1])
@@ -245,6 +192,13 @@ with col2:
     confidence = st.slider("🎯 Confidence", 0.5, 0.95, 0.85)
     face_detect = st.checkbox("👤 Face Detection", True)
     smoothing = st.checkbox("📈 Smoothing", True)
+    sample_fps = st.slider("🎞️ Frames / second", 1, 15, DEFAULT_SAMPLE_FPS,
+                           help="Frames decoded and analyzed per second of video")
+    motion_gate = st.checkbox("🏃 Motion Gate", True, help="Skip static footage instead of running the model on it")
+    alert_mode = st.checkbox("🚨 Alert Mode", False,
+                             help="Stop at the first sustained violence instead of scanning the whole clip")
+    alert_windows = st.slider("🔁 Windows in a row", 1, 10, DEFAULT_ALERT_WINDOWS, disabled=not alert_mode,
+                              help="Consecutive windows above the confidence that raise the alert")
 
 # Analysis button
 if st.button("🔍 Analyze Video for Violence", type="primary", use_container_width=True):
@@ -254,13 +208,27 @@ if st.button("🔍 Analyze Video for Violence", type="primary", use_container_wi
     if has_video:
         with st.spinner("🔄 Analyzing video..."):
             progress = st.progress(0)
-            for i in range(100):
-                progress.progress(i + 1)
-                time.sleep(0.03)
 
             # FIXED: Use proper analysis logic
             filename = st.session_state.get('uploaded_filename', '')
-            analysis_result = analyze_video_for_violence(current_video, filename)
+            analysis_start = time.perf_counter()
+            if current_video == 'uploaded' and uploaded_video is not None:
+                # Decoded from a temp copy, one frame at a time, so memory stays flat for long exports
+                try:
+                    with spool_upload(uploaded_video) as video_path:
+                        analysis_result = analyze_video_for_violence(
+                            current_video, filename, video_path=video_path, sample_fps=sample_fps,
+                            on_progress=lambda fraction: progress.progress(fraction), motion_gate=motion_gate,
+                            threshold=confidence, smoothing=DEFAULT_SMOOTHING if smoothing else 'none',
+                            alert_after=alert_windows if alert_mode else None)
+                except VideoDecodeError as e:
+                    st.error(f"⚠️ {e}")
+                    st.stop()
+            else:
+                analysis_result = analyze_video_for_violence(current_video, filename)
+            analysis_result['analysis_seconds'] = time.perf_counter() - analysis_start
+            logger.info("violence analysis of %s took %.2f ms", current_video, analysis_result['analysis_seconds'] * 1000)
+            progress.progress(100)
 
         # Store results
         st.session_state.analysis_done = True
@@ -294,6 +262,8 @@ if st.session_state.get('analysis_done') and st.session_state.get('analysis_resu
                 st.rerun()
 
         with col2:
+            interval_lines = "".join(f"Violent interval: {interval['start']:.1f}s - {interval['end']:.1f}s "
+                                     f"(peak {interval['peak']:.0%})\n" for interval in result.get('intervals', []))
             report = f"""Violence Detection Report
 
 Classification: VIOLENCE DETECTED
@@ -302,7 +272,7 @@ Analysis: {result['reasoning']}
 Motion Intensity: {result['metrics']['motion_intensity']}/10
 Aggression Score: {result['metrics']['aggression_score']}/100
 Threat Level: {result['metrics']['threat_level']}
-
+{interval_lines}
 Generated by SIA Hub Violence Detection System
 Model: MobileNetV2 + LSTM (93.25% Accuracy)"""
 
@@ -342,6 +312,38 @@ Model: MobileNetV2 + LSTM (93.25% Accuracy)"""
         st.metric("Motion Intensity", f"{result['metrics']['motion_intensity']}/10")
         st.metric("Aggression Score", f"{result['metrics']['aggression_score']}/100")
         st.metric("Threat Level", result['metrics']['threat_level'])
+        st.metric("Analysis Time", f"{result.get('analysis_seconds', 0) * 1000:.1f} ms")
+        if 'decode' in result:
+            video = result['decode']
+            st.metric("Frames Analyzed", f"{video['frames_sampled']} @ {video['sample_fps']} fps",
+                      help=f"{video['width']}x{video['height']}, {video['duration_seconds']} s, "
+                           f"decoded at {video['decode_fps']} frames/s")
+        if 'model' in result:
+            model_stats = result['model']
+            st.metric("Windows Scored", model_stats['windows_scored'],
+                      help=f"{model_stats['window_frames']}-frame windows every {model_stats['hop_frames']} frames • "
+                           f"{model_stats['embed_ms_per_frame']} ms CNN per frame, "
+                           f"{model_stats['lstm_ms_per_window']} ms LSTM per window")
+            if model_stats['motion_gate']:
+                st.metric("Static Frames Skipped", f"{model_stats['skipped_ratio']:.0%}",
+                          help=f"{model_stats['frames_skipped']} frames never reached the model"
+                               + (f", saving ~{model_stats['seconds_saved']:.2f} s of CNN time"
+                                  if not result.get('cache', {}).get('hit') else ""))
+        if 'cache' in result:
+            cache = result['cache']
+            st.metric("Embedding Cache", "hit" if cache['hit'] else "miss",
+                      help="Rescored from cached embeddings, no decoding or CNN" if cache['hit'] else
+                           f"Embeddings stored for the next analysis of this clip • {cache['entries']} clips, "
+                           f"{cache['bytes'] / 1024 / 1024:.0f} / {cache['max_bytes'] / 1024 / 1024:.0f} MB")
+        if 'alert' in result:
+            alert = result['alert']
+            if alert['triggered']:
+                st.metric("First Hit", f"{alert['first_hit']['start']:.1f} s",
+                          help=f"{alert['consecutive_windows']} windows in a row above the confidence; "
+                               f"alert raised after {alert['seconds_to_alert']:.2f} s of analysis")
+            st.metric("Clip Skipped", f"{alert['skipped_ratio']:.0%}",
+                      help=f"Stopped at {alert['stopped_at_seconds']:.1f} s; "
+                           f"{alert['skipped_seconds']:.1f} s of video never decoded")
         st.markdown('</div>', unsafe_allow_html=True)
 
     with col2:
@@ -366,6 +368,41 @@ Model: MobileNetV2 + LSTM (93.25% Accuracy)"""
             st.markdown(f"• {finding}")
         st.markdown('</div>', unsafe_allow_html=True)
 
+    # Per-window scores over the whole video, so analysts can jump to the moments that matter
+    if result.get('timeline', {}).get('times'):
+        timeline = result['timeline']
+        intervals = result['intervals']
+        st.markdown("### 📈 Violence Timeline")
+        chart = {'seconds': timeline['times'], 'score': timeline['scores'],
+                 'threshold': [result['model']['threshold']] * len(timeline['times'])}
+        if timeline['smoothing'] != 'none':
+            chart['smoothed'] = timeline['smoothed']
+        st.line_chart(chart, x='seconds', y_label="violence probability")
+        st.caption(f"One point every {timeline['step_seconds']:.2f} s • smoothing: {timeline['smoothing']}")
+        if intervals:
+            labels = [f"{interval['start']:.1f}s - {interval['end']:.1f}s (peak {interval['peak']:.0%})"
+                      for interval in intervals]
+            choice = st.selectbox("⏩ Jump to violent interval", range(len(intervals)),
+                                  format_func=lambda i: labels[i])
+            if uploaded_video is not None:
+                st.video(uploaded_video, start_time=int(intervals[choice]['start']))
+        else:
+            st.markdown(f"No stretch of the video reached the {result['model']['threshold']:.0%} threshold.")
+
+    # Where the video analysis spent its time, stage by stage
+    if result.get('pipeline'):
+        pipeline = result['pipeline']
+        with st.expander(f"⏱️ Pipeline Stages ({pipeline['wall_seconds']:.2f} s, bottleneck: {pipeline['bottleneck']})"):
+            st.markdown(f"**decode**: {pipeline['decode']['occupancy']:.0%} busy • "
+                        f"{pipeline['decode']['blocked_seconds']:.2f} s blocked on a full queue")
+            st.markdown(f"**preprocess** ({pipeline['preprocess']['workers']} workers): "
+                        f"{pipeline['preprocess']['occupancy']:.0%} busy • "
+                        f"{pipeline['preprocess']['blocked_seconds']:.2f} s decode waited for a worker")
+            st.markdown(f"**inference**: {pipeline['inference']['occupancy']:.0%} busy • "
+                        f"{pipeline['inference']['starved_seconds']:.2f} s waiting for frames")
+            st.markdown(f"**queue**: mean depth {pipeline['queue']['mean_depth']} / {pipeline['queue']['capacity']}, "
+                        f"max {pipeline['queue']['max_depth']}")
+
 # Navigation
 st.markdown("---")
 col1, col2, col3 = st.columns(3)
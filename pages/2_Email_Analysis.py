@@ -1,7 +1,15 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import numpy as np
 import time
-import re
+import os
+
+from sia.email_cache import ClassificationCache
+from sia.email_pipeline import EMAIL_STAGES, analyze_email
+from sia.email_rules import get_rules
+from sia.email_threat import CLASSIFIER_VERSION, THREAT_CLASSES
+from sia.live_scoring import LiveEmailScorer
+from sia.cascade import backend_name, classify_email, get_cascade
 
 # Page config
 st.set_page_config(
@@ -131,100 +139,48 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# PROPER Email Threat Classification (based on your LSTM model logic)
-def classify_email_threat(email_text):
-    """
-    Proper email classification using threat pattern analysis
-    This mimics your Bidirectional LSTM model's classification logic
-    """
-
-    email_lower = email_text.lower()
-
-    # Extract features like your model would
-    features = {
-        'urgency_score': 0,
-        'suspicious_urls': 0,
-        'fraud_indicators': 0,
-        'phishing_indicators': 0,
-        'spam_indicators': 0,
-        'auth_failure': 0
-    }
-
-    # Urgency detection (like your model's urgency features)
-    urgency_keywords = ['urgent', 'immediate', 'expires', 'act now', 'hurry', 'limited time', 'asap']
-    features['urgency_score'] = sum(10 for kw in urgency_keywords if kw in email_lower)
-
-    # Suspicious URL detection  
-    ip_urls = len(re.findall(r'http://(?:\d{1,3}\.){3}\d{1,3}', email_lower))
-    suspicious_tlds = sum(1 for tld in ['.tk', '.xyz', '.top'] if tld in email_lower)
-    features['suspicious_urls'] = ip_urls * 40 + suspicious_tlds * 30
-
-    # Authentication failure
-    if 'spf=fail' in email_lower or 'dkim=fail' in email_lower:
-        features['auth_failure'] = 50
-
-    # Fraud indicators (money/prize scams)
-    fraud_keywords = ['congratulations', 'won', 'winner', 'prize', 'million', '$', 'claim', 'fee', 'payment']
-    features['fraud_indicators'] = sum(8 for kw in fraud_keywords if kw in email_lower)
-
-    # Phishing indicators (account verification/suspension)
-    phishing_keywords = ['verify', 'suspended', 'account', 'click here', 'login', 'confirm', 'security']
-    features['phishing_indicators'] = sum(7 for kw in phishing_keywords if kw in email_lower)
-
-    # Spam indicators (marketing/sales)
-    spam_keywords = ['sale', 'discount', 'offer', 'deal', 'buy', 'shop', 'free', '% off']
-    features['spam_indicators'] = sum(5 for kw in spam_keywords if kw in email_lower)
-
-    # Calculate total threat score
-    total_score = (
-        features['urgency_score'] + 
-        features['suspicious_urls'] + 
-        features['auth_failure'] +
-        features['fraud_indicators'] + 
-        features['phishing_indicators'] +
-        features['spam_indicators']
-    )
-
-    # Classification logic (like your trained model)
-    if features['fraud_indicators'] >= 16 and features['urgency_score'] > 0:
-        # High fraud score + urgency = FRAUD
-        return {
-            'threat_score': min(total_score, 100),
-            'classification': 'Fraud',
-            'confidence_probs': [0.05, 0.08, 0.12, 0.75],  # [Safe, Spam, Phishing, Fraud]
-            'features': features,
-            'reasoning': 'High fraud indicators with urgency tactics'
-        }
-
-    elif features['phishing_indicators'] >= 14 and features['suspicious_urls'] > 0:
-        # Phishing patterns + suspicious URLs = PHISHING
-        return {
-            'threat_score': min(total_score, 100),
-            'classification': 'Phishing',
-            'confidence_probs': [0.08, 0.12, 0.72, 0.08],  # [Safe, Spam, Phishing, Fraud]
-            'features': features,
-            'reasoning': 'Phishing patterns with suspicious URLs detected'
-        }
-
-    elif features['spam_indicators'] >= 10 or (features['urgency_score'] > 0 and 'sale' in email_lower):
-        # Marketing/sales content = SPAM
-        return {
-            'threat_score': min(total_score, 100),
-            'classification': 'Spam/Marketing',
-            'confidence_probs': [0.15, 0.70, 0.10, 0.05],  # [Safe, Spam, Phishing, Fraud]
-            'features': features,
-            'reasoning': 'Marketing content with promotional language'
-        }
-
-    else:
-        # Low threat indicators = SAFE
-        return {
-            'threat_score': min(total_score, 100),
-            'classification': 'Safe',
-            'confidence_probs': [0.85, 0.10, 0.03, 0.02],  # [Safe, Spam, Phishing, Fraud]
-            'features': features,
-            'reasoning': 'No significant threat indicators detected'
-        }
+# Result cache shared by every session; set SIA_EMAIL_CACHE to a file path to keep it across restarts
+# (the LSTM is loaded once per process from SIA_EMAIL_MODEL / SIA_EMAIL_TOKENIZER and the fast
+# cascade tier from SIA_EMAIL_FAST_MODEL when configured)
+@st.cache_resource
+def get_email_cache():
+    return ClassificationCache(disk_path=os.environ.get('SIA_EMAIL_CACHE'),
+                               version=f"{CLASSIFIER_VERSION}:{backend_name()}")
+
+email_cache = get_email_cache()
+
+# Typing pause after which the live input reports its text; every report is rescored
+LIVE_DEBOUNCE_MS = 500
+
+EMAIL_PLACEHOLDER = "Paste the complete email content here including subject line, headers, and body..."
+
+# Text area that reports its content, and the span edited since its last report, after each pause in typing
+# (st.text_area only hands its value over on blur or Ctrl+Enter)
+live_text = components.declare_component("live_text", path=os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "components", "live_text"))
+
+
+# Reruns on its own (not the whole page) when the input reports an edit; the scorer redoes only the part
+# of the parse and of the keyword / URL scan that the edit touched
+@st.fragment
+def live_email_input():
+    if 'live_scorer' not in st.session_state:
+        st.session_state.live_scorer = LiveEmailScorer()
+    reported = live_text(value=st.session_state.get('email_draft', ''), placeholder=EMAIL_PLACEHOLDER, height=200,
+                         debounce_ms=LIVE_DEBOUNCE_MS, key="live_email_text", default=None)
+    if reported is not None:
+        st.session_state.email_draft = reported['text']
+    text = st.session_state.get('email_draft', '')
+    if not text.strip():
+        st.caption("⚡ Live verdict appears as you type")
+        return
+
+    result = st.session_state.live_scorer.update(text, reported['edit'] if reported is not None else None)
+    live = result['live']
+    st.markdown(f"**⚡ Live verdict**: {result['classification']} • "
+                f"Threat Score {result['threat_score']:.0f}/100")
+    st.caption(f"Rescored in {live['elapsed_ms']:.1f} ms ({live['parse']} parse) • keywords searched again in "
+               f"{live['keyword_chars']:,} characters • URLs in {live['line_chars']:,}")
 
 # Header
 st.markdown("""
@@ -272,12 +228,23 @@ with col1:
         st.text_area("📧 Email Content:", value=email_text, height=150, disabled=True)
 
     else:
-        email_text = st.text_area(
-            "📝 Enter email content to analyze:",
-            placeholder="Paste the complete email content here including subject line, headers, and body...",
-            height=200,
-            help="Include subject line, headers, and full email body for best analysis"
-        )
+        # The draft is kept outside either input's widget state so it survives switching between them
+        if st.toggle("⚡ Live scoring", help="Pattern verdict updated after each pause in typing; "
+                                            "the button below runs the full analysis"):
+            st.markdown("📝 Enter email content to analyze:")
+            st.session_state.pop('custom_email_text', None)
+            live_email_input()
+        else:
+            if 'custom_email_text' not in st.session_state:
+                st.session_state.custom_email_text = st.session_state.get('email_draft', '')
+            st.session_state.email_draft = st.text_area(
+                "📝 Enter email content to analyze:",
+                placeholder=EMAIL_PLACEHOLDER,
+                height=200,
+                help="Include subject line, headers, and full email body for best analysis",
+                key="custom_email_text"
+            )
+        email_text = st.session_state.get('email_draft', '')
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -292,6 +259,18 @@ with col2:
     **⚡ Processing**: Real-time analysis  
     **🔍 Detection**: Advanced pattern recognition
     """)
+    if backend_name().endswith('lstm'):
+        st.markdown("**🟢 Engine**: Bidirectional LSTM model loaded")
+    else:
+        st.markdown("**🟡 Engine**: Pattern analysis (no LSTM model configured)")
+    cascade = get_cascade()
+    if cascade is not None:
+        cascade_stats = cascade.stats()
+        st.markdown(f"**⚡ Fast Tier**: {cascade_stats['escalation_rate']:.0%} escalated • "
+                    f"{cascade_stats['fast_mean_ms']:.1f} ms fast / {cascade_stats['heavy_mean_ms']:.1f} ms deep")
+    st.markdown(f"**📜 Threat Rules**: version {get_rules().version}")
+    cache_stats = email_cache.stats()
+    st.markdown(f"**🗃️ Result Cache**: {cache_stats['hits']} hits • {cache_stats['misses']} misses")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Analysis button
@@ -300,23 +279,26 @@ if st.button("🔍 Analyze Email Threat Level", type="primary", use_container_wi
         with st.spinner("🔄 Analyzing email for threat patterns..."):
             progress = st.progress(0)
 
-            # Show analysis steps
-            steps = [
-                "Loading email content...",
-                "Extracting linguistic features...", 
-                "Running sentiment analysis...",
-                "Checking suspicious patterns...",
-                "Applying ML classification...",
-                "Generating threat assessment..."
-            ]
+            # Identical emails are scored once per rules version; otherwise run the real analysis stages
+            lookup_start = time.perf_counter()
+            rules = get_rules()
+            cache_key = email_cache.key(email_text, rules.fingerprint)
+            result = email_cache.get(cache_key)
 
-            for i, step in enumerate(steps):
-                st.text(f"🔄 {step}")
-                progress.progress((i + 1) / len(steps))
-                time.sleep(0.5)
+            if result is not None:
+                timings = {'cache lookup': time.perf_counter() - lookup_start}
+                progress.progress(1.0)
+                st.text("⚡ Served from result cache")
+            else:
+                # Progress advances as each stage actually completes
+                def show_stage(index, name, seconds):
+                    st.text(f"✅ {EMAIL_STAGES[index][1]} ({seconds * 1000:.1f} ms)")
+                    progress.progress((index + 1) / len(EMAIL_STAGES))
 
-            # FIXED: Use proper classification logic
-            result = classify_email_threat(email_text)
+                model_classify = classify_email if backend_name() != 'patterns' else None
+                result, timings = analyze_email(email_text, classify=model_classify, on_stage=show_stage,
+                                                rules=rules)
+                email_cache.put(cache_key, result)
 
         st.markdown("---")
         st.markdown("## 📋 Threat Intelligence Report")
@@ -358,6 +340,11 @@ if st.button("🔍 Analyze Email Threat Level", type="primary", use_container_wi
             </div>
             """, unsafe_allow_html=True)
 
+        # Measured stage durations
+        with st.expander(f"⏱️ Pipeline Timing ({sum(timings.values()) * 1000:.1f} ms total)"):
+            for stage, seconds in timings.items():
+                st.markdown(f"**{stage}**: {seconds * 1000:.2f} ms")
+
         # Detailed analysis
         col1, col2 = st.columns(2)
 
@@ -378,6 +365,9 @@ if st.button("🔍 Analyze Email Threat Level", type="primary", use_container_wi
                 threats_found.append(f"💰 **Fraud indicators** (Score: {features['fraud_indicators']})")
             if features['phishing_indicators'] > 0:
                 threats_found.append(f"🎣 **Phishing indicators** (Score: {features['phishing_indicators']})")
+            if features.get('pressure_tone', 0) > 0:
+                threats_found.append(f"😨 **Pressure / fear tone** (Score: {features['pressure_tone']}, "
+                                     f"{result['sentiment']['negative_share']:.0%} negative sentences)")
 
             if threats_found:
                 for threat in threats_found:
@@ -391,7 +381,7 @@ if st.button("🔍 Analyze Email Threat Level", type="primary", use_container_wi
             st.markdown('<div class="analysis-card">', unsafe_allow_html=True)
             st.markdown("#### 📊 Classification Confidence")
 
-            threat_classes = ['Safe', 'Spam/Marketing', 'Phishing', 'Fraud']
+            threat_classes = THREAT_CLASSES
             confidence_probs = result['confidence_probs']
 
             for i, (class_name, prob) in enumerate(zip(threat_classes, confidence_probs)):
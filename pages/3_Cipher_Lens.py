@@ -3,10 +3,8 @@ import numpy as np
 from PIL import Image
 import io
 import time
-import os
-import secrets
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+
+from sia.cipher import decrypt_image_data, encrypt_image_data
 
 # Page config
 st.set_page_config(
@@ -140,68 +138,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# FIXED encryption/decryption functions
-def encrypt_image_data(image_array):
-    """FIXED AES-256 encryption with proper data handling"""
-    try:
-        key = os.urandom(32)
-        img_bytes = image_array.tobytes()
-
-        # Pad data
-        padding = 16 - (len(img_bytes) % 16)
-        padded = img_bytes + bytes([padding]) * padding
-
-        # Encrypt
-        iv = os.urandom(16)
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        encryptor = cipher.encryptor()
-        encrypted = encryptor.update(padded) + encryptor.finalize()
-
-        # Return all needed info for decryption
-        return {
-            'key': key,
-            'encrypted_data': iv + encrypted,
-            'original_size': len(img_bytes),
-            'original_shape': image_array.shape,
-            'dtype': str(image_array.dtype)
-        }
-    except Exception as e:
-        st.error(f"Encryption error: {str(e)}")
-        return None
-
-def decrypt_image_data(encryption_info):
-    """FIXED AES-256 decryption with proper error handling"""
-    try:
-        key = encryption_info['key']
-        encrypted_data = encryption_info['encrypted_data']
-        original_size = encryption_info['original_size']
-        original_shape = encryption_info['original_shape']
-
-        # Extract IV and encrypted bytes
-        iv = encrypted_data[:16]
-        encrypted_bytes = encrypted_data[16:]
-
-        # Decrypt
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        padded_data = decryptor.update(encrypted_bytes) + decryptor.finalize()
-
-        # Remove padding
-        padding_length = padded_data[-1]
-        original_data = padded_data[:-padding_length]
-
-        # Ensure we have the exact original size
-        original_data = original_data[:original_size]
-
-        # Convert back to image array
-        decrypted_array = np.frombuffer(original_data, dtype=np.uint8)
-        decrypted_image = decrypted_array.reshape(original_shape)
-
-        return decrypted_image
-    except Exception as e:
-        st.error(f"Decryption error: {str(e)}")
-        return None
-
 # Initialize session state with FIXED structure
 if 'image' not in st.session_state:
     st.session_state.image = None
@@ -304,7 +240,11 @@ if st.session_state.image is not None:
                 progress = st.progress(0)
 
                 # FIXED encryption
-                encryption_info = encrypt_image_data(st.session_state.image)
+                try:
+                    encryption_info = encrypt_image_data(st.session_state.image)
+                except Exception as e:
+                    st.error(f"Encryption error: {str(e)}")
+                    encryption_info = None
 
                 progress.progress(50)
                 time.sleep(0.5)
@@ -331,7 +271,11 @@ if st.session_state.image is not None:
                     time.sleep(0.5)
 
                     # FIXED decryption
-                    decrypted_image = decrypt_image_data(st.session_state.encryption_info)
+                    try:
+                        decrypted_image = decrypt_image_data(st.session_state.encryption_info)
+                    except Exception as e:
+                        st.error(f"Decryption error: {str(e)}")
+                        decrypted_image = None
 
                     progress.progress(100)
 
@@ -0,0 +1,4 @@
+"""SIA Hub analysis engines, importable without Streamlit."""
+
+from .email_threat import classify_email_threat, classify_message
+from .violence import analyze_video_for_violence
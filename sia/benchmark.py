@@ -0,0 +1,240 @@
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+from email.message import EmailMessage
+
+from .email_parser import parse_email
+from .email_threat import THREAT_CLASSES, classify_message
+
+# Sentences per class; the generator mixes them with neutral filler text
+CLASS_SENTENCES = {
+    'Safe': [
+        "Please find the minutes of yesterday's project review attached.",
+        "The quarterly planning meeting moves to Thursday at 2 PM.",
+        "Thanks for the update, I will review the draft tonight.",
+        "Lunch with the design team is booked for Friday.",
+        "Here are the notes from the architecture discussion."
+    ],
+    'Spam/Marketing': [
+        "Our biggest sale of the year starts today with 50% off everything.",
+        "Shop now and get free shipping on every order.",
+        "Exclusive discount offer for our loyal customers.",
+        "Buy one get one free on the best deal of the season.",
+        "Limited time: the sale ends this weekend."
+    ],
+    'Phishing': [
+        "Your account has been suspended due to unusual sign-in activity.",
+        "Click here to verify your login details immediately.",
+        "Confirm your security information to restore access.",
+        "We could not verify your account, login to avoid closure.",
+        "Security alert: confirm your password within 24 hours."
+    ],
+    'Fraud': [
+        "Congratulations, you are the winner of our international lottery!",
+        "You have won a prize of 2 million dollars.",
+        "To claim your winnings pay a small processing fee of $250.",
+        "Urgent: send the payment today or the prize expires.",
+        "Act now, the claim window closes at midnight."
+    ]
+}
+FILLER_WORDS = ("the report team schedule review document office client project budget update "
+                "system network server release weekly status notes agenda draft summary").split()
+SAFE_DOMAINS = ['example.com', 'corp.example.org', 'mail.example.net']
+BAD_DOMAINS = ['login-verify.tk', 'secure-account.xyz', 'prize-center.top']
+
+
+def _url(rng, label):
+    if label in ('Phishing', 'Fraud') and rng.random() < 0.5:
+        if rng.random() < 0.5:
+            return f"http://{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}/login"
+        return f"http://{rng.choice(BAD_DOMAINS)}/verify?id={rng.randint(1000, 9999)}"
+    return f"https://{rng.choice(SAFE_DOMAINS)}/docs/{rng.randint(1, 999)}"
+
+
+def generate_email(rng, label):
+    """One synthetic message of the given class with randomized size, URLs, headers and attachments"""
+
+    msg = EmailMessage()
+    layout = rng.choice(['minimal', 'full', 'multipart'])
+    msg['Subject'] = rng.choice(CLASS_SENTENCES[label])[:60]
+    domains = SAFE_DOMAINS + BAD_DOMAINS if label in ('Phishing', 'Fraud') else SAFE_DOMAINS
+    msg['From'] = f"sender{rng.randint(1, 500)}@{rng.choice(domains)}"
+    msg['To'] = f"user{rng.randint(1, 5000)}@example.com"
+    if layout != 'minimal':
+        for hop in range(rng.randint(1, 6)):
+            msg['Received'] = f"from relay{hop}.example.net by mx{hop}.example.com; Mon, 1 Jan 2024 10:0{hop}:00 +0000"
+        failing = label in ('Phishing', 'Fraud') and rng.random() < 0.6
+        msg['Authentication-Results'] = (f"mx.example.com; spf={'fail' if failing else 'pass'}; "
+                                         f"dkim={'fail' if failing else 'pass'}")
+
+    # Body size ranges from a few lines to hundreds of KB of filler
+    paragraphs = []
+    for _ in range(rng.choice([2, 5, 20, 200, 2000])):
+        words = ' '.join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(10, 40)))
+        paragraphs.append(words.capitalize() + '.')
+    for _ in range(rng.randint(1, 3)):
+        paragraphs.insert(rng.randint(0, len(paragraphs)), rng.choice(CLASS_SENTENCES[label]))
+    for _ in range(rng.choice([0, 0, 1, 3, 10])):
+        paragraphs.insert(rng.randint(0, len(paragraphs)), _url(rng, label))
+    body = '\n\n'.join(paragraphs)
+
+    msg.set_content(body)
+    if layout == 'multipart':
+        msg.add_alternative(f"<html><body><p>{body[:5000]}</p></body></html>", subtype='html')
+        if rng.random() < 0.5:
+            size = rng.choice([1024, 64 * 1024, 2 * 1024 * 1024])
+            msg.add_attachment(rng.randbytes(size), maintype='application', subtype='octet-stream',
+                               filename=f"attachment{rng.randint(1, 99)}.bin")
+    return msg.as_bytes()
+
+
+def generate_corpus(size, seed=0):
+    """
+    Reproducible stream of (raw message bytes, label), classes in equal
+    proportion. Messages are generated one at a time, so the corpus (with
+    attachments of up to 2 MB) never sits in memory as a whole.
+    """
+
+    rng = random.Random(seed)
+    for i in range(size):
+        label = THREAT_CLASSES[i % len(THREAT_CLASSES)]
+        yield generate_email(rng, label), label
+
+
+def train_cascade(size, seed):
+    """
+    Cascade with a fast tier trained on its own synthetic corpus (use
+    another seed than the benchmark corpus) and the pattern classifier as
+    the tier it escalates to
+    """
+
+    from .cascade import CascadeClassifier, cascade_text, train_fast_tier
+
+    texts, labels = [], []
+    for raw, label in generate_corpus(size, seed):
+        texts.append(cascade_text(parse_email(raw)))
+        labels.append(label)
+    model = train_fast_tier(texts, labels)
+    return CascadeClassifier(model, heavy=classify_message)
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(corpus, classify=classify_message):
+    """
+    Throughput, latency percentiles, peak RSS and confusion matrix of
+    classify over corpus, an iterable of (raw, label). Pass a stream
+    (generate_corpus) so the peak RSS is the classifier's, not the corpus's;
+    only classify calls count towards the elapsed time.
+    """
+
+    latencies = []
+    confusion = {actual: {predicted: 0 for predicted in THREAT_CLASSES} for actual in THREAT_CLASSES}
+    for raw, label in corpus:
+        t0 = time.perf_counter()
+        result = classify(raw)
+        latencies.append(time.perf_counter() - t0)
+        confusion[label][result['classification']] += 1
+    messages = len(latencies)
+    elapsed = sum(latencies)
+
+    latencies.sort()
+    correct = sum(confusion[name][name] for name in THREAT_CLASSES)
+    return {
+        'messages': messages,
+        'elapsed_seconds': elapsed,
+        'messages_per_sec': messages / elapsed if elapsed else 0.0,
+        'p50_ms': 1000 * _percentile(latencies, 50),
+        'p95_ms': 1000 * _percentile(latencies, 95),
+        'p99_ms': 1000 * _percentile(latencies, 99),
+        # ru_maxrss is in KB on Linux (bytes on macOS)
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+        'accuracy': correct / messages if messages else 0.0,
+        'confusion': confusion
+    }
+
+
+def format_report(report):
+    lines = [
+        f"Messages:    {report['messages']}",
+        f"Throughput:  {report['messages_per_sec']:.1f} messages/sec",
+        f"Latency:     p50 {report['p50_ms']:.2f} ms • p95 {report['p95_ms']:.2f} ms • p99 {report['p99_ms']:.2f} ms",
+        f"Peak RSS:    {report['peak_rss_mb']:.1f} MB",
+        f"Accuracy:    {report['accuracy']:.2%}",
+        "",
+        "Confusion matrix (rows = label, columns = prediction):",
+        f"{'':>16}" + ''.join(f"{name:>16}" for name in THREAT_CLASSES)
+    ]
+    for actual in THREAT_CLASSES:
+        lines.append(f"{actual:>16}" + ''.join(f"{report['confusion'][actual][p]:>16}" for p in THREAT_CLASSES))
+    if 'cascade' in report:
+        tiers = report['cascade']
+        lines.insert(5, f"Cascade:     {tiers['escalation_rate']:.1%} escalated • "
+                        f"fast {tiers['fast_mean_ms']:.2f} ms • escalated {tiers['heavy_mean_ms']:.2f} ms")
+    return '\n'.join(lines)
+
+
+def check_regression(report, baseline, tolerance):
+    """Messages that describe where report is worse than baseline by more than tolerance"""
+    problems = []
+    if report['messages_per_sec'] < baseline['messages_per_sec'] * (1 - tolerance):
+        problems.append(f"throughput {report['messages_per_sec']:.1f}/s vs baseline {baseline['messages_per_sec']:.1f}/s")
+    if report['p99_ms'] > baseline['p99_ms'] * (1 + tolerance):
+        problems.append(f"p99 {report['p99_ms']:.2f} ms vs baseline {baseline['p99_ms']:.2f} ms")
+    if report['accuracy'] < baseline['accuracy'] - 0.01:
+        problems.append(f"accuracy {report['accuracy']:.2%} vs baseline {baseline['accuracy']:.2%}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark email classification on a synthetic corpus")
+    parser.add_argument('-n', '--messages', type=int, default=2000, help="Corpus size")
+    parser.add_argument('--seed', type=int, default=0, help="Corpus seed (same seed, same corpus)")
+    parser.add_argument('--engine', choices=['patterns', 'cascade', 'configured'], default='patterns',
+                        help="patterns = keyword classifier; cascade = fast tier trained on a synthetic corpus "
+                             "in front of the keyword classifier; configured = cascade/LSTM from the environment")
+    parser.add_argument('--train-messages', type=int, default=400,
+                        help="Corpus size the cascade's fast tier is trained on (seed + 1)")
+    parser.add_argument('--json', metavar='PATH', help="Also write the report as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="JSON report to compare against; exit 1 on regression")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed relative slowdown vs baseline")
+    args = parser.parse_args(argv)
+
+    classify = classify_message
+    cascade = None
+    if args.engine == 'cascade':
+        cascade = train_cascade(args.train_messages, args.seed + 1)
+        classify = cascade.classify
+    elif args.engine == 'configured':
+        from .cascade import classify_email
+        classify = classify_email
+
+    corpus = generate_corpus(args.messages, args.seed)
+    report = run_benchmark(corpus, classify)
+    if cascade is not None:
+        report['cascade'] = cascade.stats()
+    print(format_report(report))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fh:
+            problems = check_regression(report, json.load(fh), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
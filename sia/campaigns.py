@@ -0,0 +1,153 @@
+import copy
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from .email_parser import DEFAULT_MAX_BODY_CHARS, parse_email
+from .email_threat import classify_message
+
+# Mersenne prime 2**31 - 1 keeps a * x + b inside uint64 for 32-bit shingle hashes
+_PRIME = (1 << 31) - 1
+WORD = re.compile(r'\w+')
+# Campaign mutations live in greetings, links and tokens; the head of the text is enough to match on
+MAX_SHINGLE_CHARS = 20000
+
+
+def shingle_hashes(text, size=3):
+    """32-bit hashes of every run of `size` consecutive words (lowercased)"""
+    words = WORD.findall(text[:MAX_SHINGLE_CHARS].lower())
+    word_hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64,
+                              count=len(words))
+    if len(word_hashes) < size:
+        word_hashes = np.concatenate([word_hashes, np.zeros(size - len(word_hashes), dtype=np.uint64)])
+    # Polynomial combination of the word hashes, wrapped to 32 bits
+    hashes = np.zeros(len(word_hashes) - size + 1, dtype=np.uint64)
+    for offset in range(size):
+        hashes = (hashes * np.uint64(1000003) + word_hashes[offset:offset + len(hashes)]) & np.uint64(0xFFFFFFFF)
+    return hashes
+
+
+class MinHasher:
+    """num_perm universal hash functions; a text's signature is the min of each over its shingles"""
+
+    def __init__(self, num_perm=128, shingle_size=3, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = np.unique(shingle_hashes(text, self.shingle_size) % np.uint64(_PRIME))
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % np.uint64(_PRIME)).min(axis=1)
+
+
+def similarity(sig_a, sig_b):
+    """MinHash estimate of the Jaccard similarity of two texts"""
+    return float(np.mean(sig_a == sig_b))
+
+
+class CampaignIndex:
+    """
+    LSH index over MinHash signatures. Each signature is cut into `bands`
+    bands; texts sharing any band land in the same bucket and are compared
+    against that campaign's representative. With 128 permutations in 16
+    bands, pairs above ~0.7 Jaccard almost always collide.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, bands=16, shingle_size=3, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self._buckets = [{} for _ in range(bands)]
+        self._representatives = []
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def assign(self, text):
+        """(campaign_id, similarity to its representative, is_new_campaign)"""
+
+        signature = self.hasher.signature(text)
+        keys = self._band_keys(signature)
+
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_id, best_similarity = None, 0.0
+        for campaign_id in candidates:
+            score = similarity(signature, self._representatives[campaign_id])
+            if score > best_similarity:
+                best_id, best_similarity = campaign_id, score
+
+        if best_id is not None and best_similarity >= self.threshold:
+            return best_id, best_similarity, False
+
+        campaign_id = len(self._representatives)
+        self._representatives.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(campaign_id)
+        return campaign_id, 1.0, True
+
+
+class CampaignTriage:
+    """
+    Groups near-duplicate messages into campaigns in front of the classifier.
+    The first message of a campaign is classified; later members get a copy
+    of that verdict plus campaign_id / campaign_similarity. Attachments and
+    body_truncated always describe the message itself.
+    """
+
+    def __init__(self, classify=classify_message, threshold=0.8, max_body_chars=DEFAULT_MAX_BODY_CHARS):
+        self.classify_fn = classify
+        self.index = CampaignIndex(threshold=threshold)
+        self.max_body_chars = max_body_chars
+        self._lock = threading.Lock()
+        self._campaigns = []
+
+    def classify(self, raw, tag=None):
+        parsed = parse_email(raw, self.max_body_chars)
+        with self._lock:
+            campaign_id, score, is_new = self.index.assign(f"{parsed.subject}\n{parsed.body_text}")
+            if is_new:
+                result = self.classify_fn(raw)
+                self._campaigns.append({'representative': tag, 'size': 0, 'verdict': result})
+            campaign = self._campaigns[campaign_id]
+            campaign['size'] += 1
+            result = copy.deepcopy(campaign['verdict'])
+
+        if not is_new:
+            result['attachments'] = [attachment.describe() for attachment in parsed.attachments]
+            result['body_truncated'] = parsed.body_truncated
+        result['campaign_id'] = campaign_id
+        result['campaign_similarity'] = round(score, 3)
+        result['campaign_representative'] = is_new
+        return result
+
+    def campaigns(self, min_size=1):
+        """Campaign-level report, largest campaigns first"""
+        with self._lock:
+            report = [{
+                'campaign_id': campaign_id,
+                'size': campaign['size'],
+                'representative': campaign['representative'],
+                'classification': campaign['verdict']['classification'],
+                'threat_score': campaign['verdict']['threat_score']
+            } for campaign_id, campaign in enumerate(self._campaigns) if campaign['size'] >= min_size]
+        return sorted(report, key=lambda row: row['size'], reverse=True)
+
+    def stats(self):
+        with self._lock:
+            messages = sum(campaign['size'] for campaign in self._campaigns)
+            return {
+                'messages': messages,
+                'campaigns': len(self._campaigns),
+                'classified': len(self._campaigns),
+                'propagated': messages - len(self._campaigns)
+            }
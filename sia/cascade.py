@@ -0,0 +1,272 @@
+import argparse
+import csv
+import os
+import threading
+import time
+
+import numpy as np
+
+from .email_parser import DEFAULT_MAX_BODY_CHARS, parse_email
+from .email_threat import THREAT_CLASSES, extract_email_features, score_email_features
+from .lstm_backend import backend_name as heavy_backend_name
+from .lstm_backend import classify_email as classify_heavy
+
+# joblib file written by train_fast_tier / python -m sia.cascade
+FAST_MODEL_PATH_ENV = 'SIA_EMAIL_FAST_MODEL'
+DEFAULT_ACCEPT_THRESHOLD = 0.9
+# Hash buckets of the fast tier's words; few enough that its weights stay in CPU cache
+FAST_FEATURES = 2 ** 14
+# Punctuation trimmed from the ends of whitespace-separated words
+WORD_PUNCTUATION = '.,;:!?()[]{}<>"\'*'
+
+
+def fast_tokens(text):
+    """
+    Distinct lowercased words of text. The tier only looks at which words
+    are present, and a whitespace split is several times cheaper than a
+    token regex on long bodies.
+    """
+
+    words = {word.strip(WORD_PUNCTUATION) for word in set(text.lower().split())}
+    words.discard('')
+    return words
+
+
+def build_fast_model():
+    """Hashed word presence into a logistic-loss linear model (scored as one dot product, see linear_weights)"""
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline
+
+    return make_pipeline(
+        HashingVectorizer(n_features=FAST_FEATURES, analyzer=fast_tokens, binary=True, alternate_sign=False,
+                          norm=None),
+        SGDClassifier(loss='log_loss', alpha=1e-4, max_iter=20, tol=None, random_state=0)
+    )
+
+
+def linear_weights(linear):
+    """
+    (n_features, classes) weights and (classes,) biases of a fitted linear
+    classifier, columns in THREAT_CLASSES order; classes it never saw get
+    a bias of -inf, so they score 0
+    """
+
+    coef, intercept = linear.coef_, linear.intercept_
+    if len(linear.classes_) == 2:
+        # Binary models keep one row, for the second class
+        coef, intercept = np.vstack([-coef, coef]), np.concatenate([-intercept, intercept])
+    classes = list(linear.classes_)
+    weights = np.zeros((coef.shape[1], len(THREAT_CLASSES)))
+    bias = np.full(len(THREAT_CLASSES), -np.inf)
+    for i, name in enumerate(THREAT_CLASSES):
+        if name in classes:
+            weights[:, i] = coef[classes.index(name)]
+            bias[i] = intercept[classes.index(name)]
+    return weights, bias
+
+
+def train_fast_tier(texts, labels, path=None):
+    """Fit the tier-1 model on (text, class name) pairs; optionally save it with joblib"""
+    import joblib
+
+    model = build_fast_model()
+    model.fit(list(texts), list(labels))
+    if path:
+        joblib.dump(model, path)
+    return model
+
+
+def cascade_text(parsed):
+    """Subject and bounded body, the text both tiers are trained on"""
+    return f"{parsed.subject}\n{parsed.body_text}"
+
+
+class CascadeClassifier:
+    """
+    Two-tier email classifier. The linear model answers when its top class
+    probability reaches accept_threshold; everything else escalates to the
+    heavy scorer (the LSTM backend, or the pattern classifier without one),
+    called as heavy(raw, parsed=, scored=) like lstm_backend.classify_email.
+    Keeps counts of escalations and per-tier latency.
+    """
+
+    def __init__(self, fast_model, heavy=classify_heavy, accept_threshold=DEFAULT_ACCEPT_THRESHOLD,
+                 max_body_chars=DEFAULT_MAX_BODY_CHARS):
+        self.fast_model = fast_model
+        self.heavy = heavy
+        self.accept_threshold = accept_threshold
+        self.max_body_chars = max_body_chars
+
+        # Tier 1 skips the pipeline's predict_proba: its feature steps, then one sparse product with the weights
+        self._vectorize = fast_model[:-1].transform
+        self._weights, self._bias = linear_weights(fast_model[-1])
+
+        self._lock = threading.Lock()
+        self._counts = {'fast': 0, 'heavy': 0}
+        self._seconds = {'fast': 0.0, 'heavy': 0.0}
+
+    def _probs(self, texts):
+        """One-vs-rest class probabilities, normalized as SGDClassifier.predict_proba does"""
+        decision = self._vectorize(texts) @ self._weights + self._bias
+        # Logistic function without overflow: 1 / (1 + e^-x) = e^-log(1 + e^-x)
+        probs = np.exp(-np.logaddexp(0, -decision))
+        total = probs.sum(axis=1, keepdims=True)
+        return np.divide(probs, total, out=np.full_like(probs, 1 / len(THREAT_CLASSES)), where=total > 0)
+
+    def _record(self, tier, count, seconds):
+        with self._lock:
+            self._counts[tier] += count
+            self._seconds[tier] += seconds
+
+    def _fast_result(self, parsed, probs):
+        """
+        Verdict of the linear tier only. The pattern features that explain
+        it cost more than the tier itself, so they are left to explain()
+        """
+
+        best = int(np.argmax(probs))
+        return {
+            'classification': THREAT_CLASSES[best],
+            'confidence_probs': [float(p) for p in probs],
+            'threat_score': round((1 - float(probs[0])) * 100),
+            'reasoning': f"Fast linear tier: {THREAT_CLASSES[best]} ({probs[best]:.1%} confidence)",
+            'attachments': [attachment.describe() for attachment in parsed.attachments],
+            'body_truncated': parsed.body_truncated,
+            'tier': 'fast'
+        }
+
+    def explain(self, result, parsed, rules=None):
+        """
+        Add the pattern features behind the threat vector report to a
+        fast-tier result; rules as in classify_message
+        """
+
+        if 'features' in result:
+            return result
+        features, hits = extract_email_features(parsed.scan_text(), auth_failure=parsed.auth_failed, rules=rules)
+        explained = score_email_features(features, hits, rules)
+        for key in ('features', 'sentiment'):
+            if key in explained:
+                result[key] = explained[key]
+        return result
+
+    def classify_batch(self, raws, parsed=None, scored=None):
+        """
+        Classify a list of raw messages; tier 1 scores the whole list in one
+        call. parsed / scored: their ParsedEmail and pattern results, when the
+        caller already has them. Fast-tier results carry the verdict without
+        pattern features unless scored provides them.
+        """
+
+        start = time.perf_counter()
+        if parsed is None:
+            parsed = [parse_email(raw, self.max_body_chars) for raw in raws]
+        probs = self._probs([cascade_text(p) for p in parsed]) if raws else []
+        # Tier 1 scored every message, so each one is charged its share, escalated or not
+        tier1 = (time.perf_counter() - start) / len(raws) if raws else 0.0
+        accepted = [i for i, row in enumerate(probs) if row.max() >= self.accept_threshold]
+        results = [None] * len(raws)
+        for i in accepted:
+            results[i] = self._fast_result(parsed[i], probs[i])
+            if scored is not None:
+                results[i] = {**scored[i], **results[i]}
+        if accepted:
+            self._record('fast', len(accepted), tier1 * len(accepted))
+
+        for i, result in enumerate(results):
+            if result is None:
+                heavy_start = time.perf_counter()
+                results[i] = self.heavy(raws[i], parsed=parsed[i], scored=scored[i] if scored is not None else None)
+                results[i]['tier'] = 'heavy'
+                self._record('heavy', 1, tier1 + time.perf_counter() - heavy_start)
+        return results
+
+    def classify(self, raw, parsed=None, scored=None, explain=False, rules=None):
+        """
+        One message (parsed / scored as in classify_batch); explain=True adds
+        the pattern features, scored with rules, to a fast-tier verdict that
+        has none
+        """
+
+        if parsed is None and explain:
+            parsed = parse_email(raw, self.max_body_chars)
+        result = self.classify_batch([raw], None if parsed is None else [parsed],
+                                     None if scored is None else [scored])[0]
+        return self.explain(result, parsed, rules) if explain and result['tier'] == 'fast' else result
+
+    def stats(self):
+        """
+        Escalation rate and mean latency (ms) of the messages each tier
+        answered; an escalated message's latency includes its tier-1 share
+        """
+
+        with self._lock:
+            total = self._counts['fast'] + self._counts['heavy']
+            seconds = self._seconds['fast'] + self._seconds['heavy']
+            return {
+                'messages': total,
+                'fast': self._counts['fast'],
+                'escalated': self._counts['heavy'],
+                'escalation_rate': self._counts['heavy'] / total if total else 0.0,
+                'fast_mean_ms': 1000 * self._seconds['fast'] / self._counts['fast'] if self._counts['fast'] else 0.0,
+                'heavy_mean_ms': 1000 * self._seconds['heavy'] / self._counts['heavy'] if self._counts['heavy'] else 0.0,
+                'mean_ms': 1000 * seconds / total if total else 0.0
+            }
+
+
+_cascade = None
+_cascade_loaded = False
+_cascade_lock = threading.Lock()
+
+
+def get_cascade():
+    """Process-wide CascadeClassifier from SIA_EMAIL_FAST_MODEL, or None when not configured"""
+    global _cascade, _cascade_loaded
+    with _cascade_lock:
+        if not _cascade_loaded:
+            _cascade_loaded = True
+            path = os.environ.get(FAST_MODEL_PATH_ENV)
+            if path:
+                import joblib
+                threshold = float(os.environ.get('SIA_EMAIL_FAST_THRESHOLD', DEFAULT_ACCEPT_THRESHOLD))
+                _cascade = CascadeClassifier(joblib.load(path), accept_threshold=threshold)
+        return _cascade
+
+
+def backend_name():
+    heavy = heavy_backend_name()
+    return f"cascade+{heavy}" if get_cascade() is not None else heavy
+
+
+def classify_email(raw, parsed=None, scored=None):
+    """
+    Cascade when a fast model is configured, otherwise straight to the heavy
+    scorer; parsed / scored as in lstm_backend.classify_email
+    """
+
+    cascade = get_cascade()
+    if cascade is None:
+        return classify_heavy(raw, parsed, scored)
+    return cascade.classify(raw, parsed, scored)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the fast tier of the email cascade")
+    parser.add_argument('corpus', help="CSV file with 'text' and 'label' columns (labels are THREAT_CLASSES names)")
+    parser.add_argument('-o', '--output', required=True, help="joblib file to write (use as SIA_EMAIL_FAST_MODEL)")
+    args = parser.parse_args(argv)
+
+    texts, labels = [], []
+    with open(args.corpus, newline='', encoding='utf-8') as fh:
+        for row in csv.DictReader(fh):
+            parsed = parse_email(row['text'])
+            texts.append(cascade_text(parsed))
+            labels.append(row['label'])
+
+    train_fast_tier(texts, labels, args.output)
+    print(f"Trained fast tier on {len(texts)} emails -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
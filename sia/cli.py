@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import sys
+
+from . import feature_frame, mailbox_batch, streams, violence_tflite
+from .timeline import DEFAULT_SMOOTHING, SMOOTHING_METHODS
+from .video_frames import DEFAULT_SAMPLE_FPS, VideoDecodeError
+from .violence import DETECTION_THRESHOLD
+
+
+def run_video(args):
+    from .violence import analyze_video_for_violence
+
+    for path in args.videos:
+        try:
+            result = analyze_video_for_violence('uploaded', os.path.basename(path), video_path=path,
+                                                sample_fps=args.sample_fps, motion_gate=args.motion_gate,
+                                                threshold=args.threshold, smoothing=args.smoothing,
+                                                alert_after=args.alert, use_cache=args.cache)
+        except VideoDecodeError as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            continue
+        if args.json:
+            print(json.dumps({'video': path, **result}))
+        else:
+            verdict = "VIOLENCE" if result['violence_detected'] else "safe"
+            print(f"{path}: {verdict} ({result['confidence']:.1%}) - {result['reasoning']}")
+            if 'alert' in result:
+                alert = result['alert']
+                print(f"  alert mode: stopped at {alert['stopped_at_seconds']:.1f}s after "
+                      f"{alert['seconds_to_alert']:.2f}s, {alert['skipped_ratio']:.0%} of the clip skipped")
+            for interval in result.get('intervals', []):
+                print(f"  {interval['start']:8.1f}s - {interval['end']:8.1f}s  peak {interval['peak']:.1%}")
+
+
+def run_encrypt(args):
+    import numpy as np
+    from PIL import Image
+
+    from .cipher import encrypt_image_data
+
+    os.makedirs(args.output, exist_ok=True)
+    for path in args.images:
+        name = os.path.basename(path)
+        info = encrypt_image_data(np.array(Image.open(path)))
+        with open(os.path.join(args.output, f"encrypted_{name}.dat"), 'wb') as fh:
+            fh.write(info['encrypted_data'])
+        # Key and layout needed by `sia decrypt`; keep this file secret
+        with open(os.path.join(args.output, f"encrypted_{name}.key.json"), 'w', encoding='utf-8') as fh:
+            json.dump({
+                'key': info['key'].hex(),
+                'original_size': info['original_size'],
+                'original_shape': list(info['original_shape']),
+                'dtype': info['dtype']
+            }, fh)
+        print(f"{path} -> encrypted_{name}.dat")
+
+
+def run_decrypt(args):
+    from PIL import Image
+
+    from .cipher import decrypt_image_data
+
+    os.makedirs(args.output, exist_ok=True)
+    for path in args.files:
+        stem = path[:-len('.dat')] if path.endswith('.dat') else path
+        with open(stem + '.key.json', encoding='utf-8') as fh:
+            meta = json.load(fh)
+        with open(path, 'rb') as fh:
+            encrypted_data = fh.read()
+        image = decrypt_image_data({
+            'key': bytes.fromhex(meta['key']),
+            'encrypted_data': encrypted_data,
+            'original_size': meta['original_size'],
+            'original_shape': tuple(meta['original_shape'])
+        })
+        name = os.path.splitext(os.path.basename(stem).removeprefix('encrypted_'))[0]
+        out_path = os.path.join(args.output, f"decrypted_{name}.png")
+        Image.fromarray(image).save(out_path)
+        print(f"{path} -> {out_path}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='sia', description="SIA Hub analysis engines without the Streamlit UI")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    email = commands.add_parser('email', help="Classify mbox / Maildir / .eml archives to CSV or Parquet")
+    mailbox_batch.add_arguments(email)
+    email.set_defaults(handler=mailbox_batch.run)
+
+    features = commands.add_parser('email-features', help="Email threat features for a CSV / Parquet corpus")
+    feature_frame.add_arguments(features)
+    features.set_defaults(handler=feature_frame.run)
+
+    video = commands.add_parser('video', help="Scan video files for violence")
+    video.add_argument('videos', nargs='+', help="Video files")
+    video.add_argument('--json', action='store_true', help="One JSON result per line")
+    video.add_argument('--sample-fps', type=float, default=DEFAULT_SAMPLE_FPS, help="Frames per second analyzed")
+    video.add_argument('--no-motion-gate', dest='motion_gate', action='store_false',
+                       help="Run the model on static footage too")
+    video.add_argument('--threshold', type=float, default=DETECTION_THRESHOLD,
+                       help="Smoothed window probability that counts as violence")
+    video.add_argument('--smoothing', choices=SMOOTHING_METHODS, default=DEFAULT_SMOOTHING,
+                       help="How window scores are smoothed before thresholding")
+    video.add_argument('--alert', type=int, metavar='N',
+                       help="Alert mode: stop at the first N consecutive windows above the threshold")
+    video.add_argument('--no-cache', dest='cache', action='store_false',
+                       help="Neither read nor write the embedding cache")
+    video.set_defaults(handler=run_video)
+
+    ingest = commands.add_parser('streams', help="Ingest several video streams in real time")
+    streams.add_arguments(ingest)
+    ingest.set_defaults(handler=streams.run)
+
+    quantize = commands.add_parser('violence-tflite', help="Quantized TFLite violence CNN: convert or benchmark")
+    violence_tflite.add_arguments(quantize)
+    quantize.set_defaults(handler=violence_tflite.run)
+
+    encrypt = commands.add_parser('encrypt', help="AES-256 encrypt images in bulk")
+    encrypt.add_argument('images', nargs='+', help="Image files")
+    encrypt.add_argument('-o', '--output', default='.', help="Directory for .dat files and their .key.json files")
+    encrypt.set_defaults(handler=run_encrypt)
+
+    decrypt = commands.add_parser('decrypt', help="Decrypt .dat files written by `sia encrypt`")
+    decrypt.add_argument('files', nargs='+', help=".dat files (the matching .key.json must sit next to them)")
+    decrypt.add_argument('-o', '--output', default='.', help="Directory for the decrypted PNG images")
+    decrypt.set_defaults(handler=run_decrypt)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
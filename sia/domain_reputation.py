@@ -0,0 +1,133 @@
+import hashlib
+import math
+import os
+import threading
+from itertools import islice
+
+import numpy as np
+
+from .urls import get_public_suffixes, normalize_host
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing of one blake2b digest)"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    @staticmethod
+    def _digest(item):
+        return hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+
+    def _positions(self, item):
+        digest = self._digest(item)
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        self.update([item])
+
+    def update(self, items):
+        """Add many items; bit positions are computed for the whole batch at once"""
+        digests = np.frombuffer(b''.join(map(self._digest, items)), dtype='<u8').reshape(-1, 2)
+        if not len(digests):
+            return
+        # Same positions as _positions; both terms are reduced mod size first so uint64 cannot overflow
+        size = np.uint64(self.size)
+        h1 = digests[:, 0] % size
+        h2 = (digests[:, 1] | np.uint64(1)) % size
+        for i in range(self.hashes):
+            positions = (h1 + np.uint64(i) * h2 % size) % size
+            np.bitwise_or.at(self._bits, positions >> np.uint64(3),
+                             np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def _blocklist_entry(line):
+    """Domain from a blocklist line: plain domains, hosts-file lines ("0.0.0.0 evil.com") and # comments"""
+    line = line.split('#', 1)[0].strip()
+    if not line:
+        return None
+    domain = normalize_host(line.split()[-1])
+    if domain in ('localhost', 'localhost.localdomain', '0.0.0.0'):
+        return None
+    return domain
+
+
+class DomainBlocklist:
+    """
+    Local domain reputation index. Every lookup goes through the Bloom filter
+    first; its positives are confirmed against the exact set. With
+    exact=False only the filter is kept (about 1.8 bytes per domain at a 0.1%
+    false-positive rate) for lists too large to hold as strings.
+    A listed domain also covers all of its subdomains.
+    """
+
+    def __init__(self, domains=(), exact=True, error_rate=0.001):
+        domains = [domain for domain in (normalize_host(d) for d in domains) if domain]
+        self._bloom = BloomFilter(len(domains), error_rate)
+        self._exact = set() if exact else None
+        self._count = 0
+        self._add(domains)
+
+    def _add(self, domains):
+        self._bloom.update(domains)
+        if self._exact is not None:
+            self._exact.update(domains)
+        self._count += len(domains)
+
+    @classmethod
+    def from_file(cls, path, exact=True, error_rate=0.001):
+        """Load one domain per line; the file is read twice so the filter is sized before filling"""
+        with open(path, encoding='utf-8', errors='replace') as fh:
+            capacity = sum(1 for _ in fh)
+        blocklist = cls(exact=exact, error_rate=error_rate)
+        blocklist._bloom = BloomFilter(capacity, error_rate)
+        with open(path, encoding='utf-8', errors='replace') as fh:
+            while True:
+                lines = list(islice(fh, 100000))
+                if not lines:
+                    break
+                blocklist._add([domain for domain in map(_blocklist_entry, lines) if domain])
+        return blocklist
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, domain):
+        return domain in self._bloom and (self._exact is None or domain in self._exact)
+
+    def lookup(self, host, suffixes=None):
+        """The listed domain covering host (host itself or a parent down to its eTLD+1), or None"""
+        suffixes = suffixes or get_public_suffixes()
+        labels = host.split('.')
+        stop = len(labels) - suffixes.suffix_length(labels)
+        for start in range(max(stop, 1)):
+            candidate = '.'.join(labels[start:])
+            if candidate in self:
+                return candidate
+        return None
+
+
+_blocklist = None
+_blocklist_loaded = False
+_blocklist_lock = threading.Lock()
+
+
+def get_blocklist():
+    """Process-wide DomainBlocklist from SIA_DOMAIN_BLOCKLIST, or None when not configured"""
+    global _blocklist, _blocklist_loaded
+    with _blocklist_lock:
+        if not _blocklist_loaded:
+            _blocklist_loaded = True
+            path = os.environ.get('SIA_DOMAIN_BLOCKLIST')
+            if path:
+                _blocklist = DomainBlocklist.from_file(path, exact=os.environ.get('SIA_DOMAIN_BLOCKLIST_EXACT', '1') != '0')
+        return _blocklist
@@ -0,0 +1,127 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .email_threat import CLASSIFIER_VERSION, classify_message
+
+
+def content_key(email_text, version=CLASSIFIER_VERSION):
+    """
+    Hash of the message (bytes or text) after normalizing what the classifier
+    ignores: CRLF vs LF line endings and trailing whitespace. Case is kept,
+    since base64 / quoted-printable bodies are decoded before scanning.
+    """
+
+    if isinstance(email_text, str):
+        email_text = email_text.encode('utf-8', errors='surrogatepass')
+    normalized = email_text.rstrip().replace(b'\r\n', b'\n')
+
+    digest = hashlib.sha256(f"v{version}:".encode())
+    digest.update(normalized)
+    return digest.hexdigest()
+
+
+class ClassificationCache:
+    """
+    Memoizes classification results by normalized content hash.
+
+    A bounded in-memory LRU sits in front of an optional SQLite file, so
+    verdicts survive Streamlit restarts when disk_path is set. Safe to share
+    between Streamlit sessions (threads).
+    """
+
+    def __init__(self, maxsize=10000, disk_path=None, version=CLASSIFIER_VERSION):
+        self.maxsize = maxsize
+        self.version = version
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def key(self, email_text, rules_version=None):
+        """Cache key of email_text; pass the rules fingerprint the verdict is computed with"""
+        version = self.version if rules_version is None else f"{self.version}:{rules_version}"
+        return content_key(email_text, version)
+
+    def get(self, key):
+        """Cached result for key, or None"""
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return copy.deepcopy(result)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+                    self._hits += 1
+                    self._disk_hits += 1
+                    return copy.deepcopy(result)
+
+            self._misses += 1
+            return None
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, copy.deepcopy(result))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, result, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(result), time.time())
+                )
+                self._db.commit()
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def classify(self, email_text, classify=classify_message):
+        """classify(email_text), computed once per distinct normalized content"""
+        key = self.key(email_text)
+        result = self.get(key)
+        if result is None:
+            result = classify(email_text)
+            self.put(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,258 @@
+import base64
+import binascii
+import re
+from email import policy
+from email.parser import BytesHeaderParser
+
+# Only this many characters of decoded body text are handed to the classifier
+DEFAULT_MAX_BODY_CHARS = 256 * 1024
+# Header blocks larger than this are not treated as headers
+MAX_HEADER_BYTES = 64 * 1024
+
+HEADER_END = re.compile(rb'\r?\n\r?\n')
+HEADER_LINE = re.compile(rb'^(?:[!-9;-~]+:|[ \t])')
+AUTH_RESULT = re.compile(r'\b(spf|dkim|dmarc|arc)\s*=\s*([a-z]+)', re.IGNORECASE)
+AUTH_FAILURES = ('fail', 'permerror')
+
+_header_parser = BytesHeaderParser(policy=policy.default)
+
+
+class Attachment:
+    """A non-text MIME part; its payload is only decoded when asked for"""
+
+    def __init__(self, raw, start, end, content_type, filename, encoding):
+        self._raw = raw
+        self._start = start
+        self._end = end
+        self.content_type = content_type
+        self.filename = filename
+        self.encoding = encoding
+
+    @property
+    def size(self):
+        """Encoded size in bytes"""
+        return self._end - self._start
+
+    def decode(self):
+        return _decode_transfer(self._raw, self._start, self._end, self.encoding)[0]
+
+    def describe(self):
+        return {'filename': self.filename, 'content_type': self.content_type, 'size': self.size}
+
+
+class ParsedEmail:
+    """Headers, a bounded prefix of the decoded text body and lazily decoded attachments"""
+
+    def __init__(self):
+        self.headers = None
+        self.header_text = ''
+        self.body_parts = []
+        self.body_chars = 0
+        self.body_truncated = False
+        self.attachments = []
+
+    @property
+    def subject(self):
+        return _header_str(self.headers, 'subject')
+
+    @property
+    def received(self):
+        """Received headers, newest hop first"""
+        if self.headers is None:
+            return []
+        return [str(value) for value in self.headers.get_all('received', [])]
+
+    @property
+    def auth_results(self):
+        """{'spf': ['fail'], 'dkim': ['pass'], ...} from Authentication-Results / Received-SPF"""
+        results = {}
+        if self.headers is None:
+            return results
+        for value in self.headers.get_all('authentication-results', []):
+            for method, outcome in AUTH_RESULT.findall(str(value)):
+                results.setdefault(method.lower(), []).append(outcome.lower())
+        for value in self.headers.get_all('received-spf', []):
+            words = str(value).split()
+            if words:
+                results.setdefault('spf', []).append(words[0].lower())
+        return results
+
+    @property
+    def auth_failed(self):
+        results = self.auth_results
+        return any(outcome in AUTH_FAILURES for method in ('spf', 'dkim') for outcome in results.get(method, []))
+
+    @property
+    def body_text(self):
+        return ''.join(self.body_parts)
+
+    def scan_text(self):
+        """The text the keyword classifier looks at: raw headers plus the bounded body"""
+        if self.header_text:
+            return self.header_text + '\n\n' + self.body_text
+        return self.body_text
+
+
+def _header_str(headers, name):
+    if headers is None:
+        return ''
+    try:
+        value = headers.get(name)
+    except (ValueError, IndexError):
+        value = None
+    return str(value) if value is not None else ''
+
+
+def _split_headers(raw, start, end):
+    """(header_end, body_start) of a header block at raw[start:end], or None if there is none"""
+    match = HEADER_END.search(raw, start, min(end, start + MAX_HEADER_BYTES))
+    if match is None:
+        return None
+    lines = raw[start:match.start()].splitlines()
+    if not lines or not all(HEADER_LINE.match(line) for line in lines):
+        return None
+    return match.start(), match.end()
+
+
+def _decode_transfer(raw, start, end, encoding, limit=None):
+    """
+    Undo the Content-Transfer-Encoding of raw[start:end]. With limit, only
+    enough input for about limit characters of output is sliced and decoded.
+    Returns (data, cut) where cut tells whether input was left undecoded.
+    """
+
+    encoding = (encoding or '').lower()
+    if limit is not None:
+        if encoding == 'base64':
+            # 4 input chars per 3 bytes, plus slack for line breaks
+            stop = start + limit * 4 // 3 + limit // 16 + 4
+        elif encoding == 'quoted-printable':
+            stop = start + limit * 3
+        else:
+            stop = start + limit * 4
+        end, cut = min(end, stop), stop < end
+    else:
+        cut = False
+
+    data = raw[start:end]
+    if encoding == 'base64':
+        data = b''.join(data.split())
+        data = data[:len(data) - len(data) % 4]
+        try:
+            return base64.b64decode(data), cut
+        except (binascii.Error, ValueError):
+            return b'', cut
+    if encoding == 'quoted-printable':
+        return binascii.a2b_qp(data), cut
+    return data, cut
+
+
+def _walk(raw, start, end, headers, parsed, max_body_chars):
+    """Collect text and attachments of the MIME entity at raw[start:end]"""
+
+    content_type = headers.get_content_type() if headers is not None else 'text/plain'
+    encoding = _header_str(headers, 'content-transfer-encoding').strip()
+    disposition = _header_str(headers, 'content-disposition').split(';')[0].strip().lower()
+
+    if content_type.startswith('multipart/'):
+        boundary = headers.get_param('boundary')
+        if not boundary:
+            return
+        delimiter = b'--' + str(boundary).encode('ascii', errors='replace')
+        pos = raw.find(delimiter, start, end)
+        while pos != -1:
+            after = pos + len(delimiter)
+            if raw[after:after + 2] == b'--':
+                break
+            part_start = raw.find(b'\n', after, end)
+            if part_start == -1:
+                break
+            part_start += 1
+            next_pos = raw.find(delimiter, part_start, end)
+            part_end = end if next_pos == -1 else next_pos
+            split = _split_headers(raw, part_start, part_end)
+            if split is None:
+                part_headers, body_start = None, part_start
+            else:
+                part_headers = _header_parser.parsebytes(raw[part_start:split[0]])
+                body_start = split[1]
+            _walk(raw, body_start, part_end, part_headers, parsed, max_body_chars)
+            pos = next_pos
+        return
+
+    if content_type.startswith('text/') and disposition != 'attachment':
+        remaining = max_body_chars - parsed.body_chars
+        if remaining <= 0:
+            parsed.body_truncated = True
+            return
+        charset = headers.get_content_charset() if headers is not None else None
+        data, cut = _decode_transfer(raw, start, end, encoding, remaining)
+        try:
+            text = data.decode(charset or 'utf-8', errors='replace')
+        except LookupError:
+            text = data.decode('utf-8', errors='replace')
+        if cut or len(text) > remaining:
+            parsed.body_truncated = True
+        text = text[:remaining]
+        parsed.body_parts.append(text)
+        parsed.body_chars += len(text)
+        return
+
+    filename = headers.get_filename() if headers is not None else None
+    parsed.attachments.append(Attachment(raw, start, end, content_type, filename, encoding))
+
+
+def split_header_block(text):
+    """
+    The header block of a message given as str, found as parse_email finds
+    it: (headers, header_end, body_start) with str offsets, or (None, 0, 0)
+    when the text has none. Only the first MAX_HEADER_BYTES characters are
+    looked at.
+    """
+
+    head = text[:MAX_HEADER_BYTES].encode('utf-8', errors='surrogatepass')
+    split = _split_headers(head, 0, len(head))
+    if split is None:
+        return None, 0, 0
+    return (_header_parser.parsebytes(head[:split[0]]),
+            len(head[:split[0]].decode('utf-8', errors='surrogatepass')),
+            len(head[:split[1]].decode('utf-8', errors='surrogatepass')))
+
+
+def plain_body(headers):
+    """
+    Whether parse_email takes the body under these headers (None: no header
+    block) as it is: one text part, no transfer encoding, UTF-8 or unstated
+    charset. Its body text is then a prefix of the raw body.
+    """
+
+    if headers is None:
+        return True
+    encoding = _header_str(headers, 'content-transfer-encoding').strip().lower()
+    disposition = _header_str(headers, 'content-disposition').split(';')[0].strip().lower()
+    return (headers.get_content_type().startswith('text/') and disposition != 'attachment'
+            and encoding in ('', '7bit', '8bit', 'binary') and headers.get_content_charset() in (None, 'utf-8', 'utf8'))
+
+
+def parse_email(raw, max_body_chars=DEFAULT_MAX_BODY_CHARS):
+    """
+    Split an RFC 822 message (bytes or str) into headers and MIME parts.
+    Attachments are skipped (decoded on demand) and at most max_body_chars
+    characters of text body are decoded, whatever the size of the message.
+    Text without a header block (e.g. a pasted body) is treated as the body.
+    """
+
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8', errors='surrogatepass')
+
+    parsed = ParsedEmail()
+    split = _split_headers(raw, 0, len(raw))
+    if split is None:
+        body_start = 0
+    else:
+        parsed.headers = _header_parser.parsebytes(raw[:split[0]])
+        parsed.header_text = raw[:split[0]].decode('utf-8', errors='replace')
+        body_start = split[1]
+
+    _walk(raw, body_start, len(raw), parsed.headers, parsed, max_body_chars)
+    return parsed
@@ -0,0 +1,76 @@
+import logging
+import time
+
+from .email_parser import DEFAULT_MAX_BODY_CHARS, parse_email
+from .email_rules import get_rules
+from .email_threat import check_sentiment, check_suspicious_patterns, keyword_features, score_email_features
+
+logger = logging.getLogger(__name__)
+
+# (stage name, progress message) in execution order
+EMAIL_STAGES = [
+    ('parse', "Loading email content..."),
+    ('features', "Extracting linguistic features..."),
+    ('sentiment', "Running sentiment analysis..."),
+    ('patterns', "Checking suspicious patterns..."),
+    ('classify', "Applying ML classification..."),
+    ('report', "Generating threat assessment...")
+]
+
+
+def analyze_email(raw, classify=None, on_stage=None, max_body_chars=DEFAULT_MAX_BODY_CHARS, rules=None):
+    """
+    Run the email analysis as timed stages and return (result, timings).
+
+    classify: optional model callable (e.g. cascade.classify_email) whose
+    classification / confidence_probs / threat_score / reasoning replace the
+    pattern verdict; it is handed the parsed message and pattern result
+    (classify(raw, parsed=, scored=)) so it does not redo them. on_stage(index, name, seconds) is called as each stage
+    completes, so progress reflects real work. timings maps stage -> seconds.
+    Every stage scores with the same rules (default: the rules in service now).
+    """
+
+    rules = rules or get_rules()
+    timings = {}
+    state = {}
+
+    def parse():
+        state['parsed'] = parse_email(raw, max_body_chars)
+        state['email_text'] = state['parsed'].scan_text()
+        state['email_lower'] = state['email_text'].lower()
+
+    def features():
+        state['features'], state['hits'] = keyword_features(state['email_lower'], rules)
+
+    def sentiment():
+        check_sentiment(state['features'], state['hits'], state['email_text'], rules)
+
+    def patterns():
+        check_suspicious_patterns(state['features'], state['hits'], state['email_lower'],
+                                  auth_failure=state['parsed'].auth_failed, rules=rules)
+
+    def classify_stage():
+        result = score_email_features(state['features'], state['hits'], rules)
+        if classify is not None:
+            verdict = classify(raw, parsed=state['parsed'], scored=result)
+            for key in ('classification', 'confidence_probs', 'threat_score', 'reasoning'):
+                result[key] = verdict[key]
+        state['result'] = result
+
+    def report():
+        parsed = state['parsed']
+        state['result']['attachments'] = [attachment.describe() for attachment in parsed.attachments]
+        state['result']['body_truncated'] = parsed.body_truncated
+
+    steps = {'parse': parse, 'features': features, 'sentiment': sentiment, 'patterns': patterns,
+             'classify': classify_stage, 'report': report}
+    for index, (name, _) in enumerate(EMAIL_STAGES):
+        start = time.perf_counter()
+        steps[name]()
+        timings[name] = time.perf_counter() - start
+        if on_stage is not None:
+            on_stage(index, name, timings[name])
+
+    logger.info("email analysis stages: %s",
+                ", ".join(f"{name}={1000 * seconds:.2f}ms" for name, seconds in timings.items()))
+    return state['result'], timings
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import operator
+import os
+import threading
+import time
+
+from .keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+# Order of confidence_probs in every classification result
+THREAT_CLASSES = ['Safe', 'Spam/Marketing', 'Phishing', 'Fraud']
+
+# Feature vector of every classification, in report order
+FEATURES = ['urgency_score', 'suspicious_urls', 'fraud_indicators', 'phishing_indicators', 'spam_indicators',
+            'auth_failure', 'pressure_tone']
+
+# Shipped rules; SIA_EMAIL_RULES points at a tuned copy
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'rules', 'email_rules.json')
+RULES_PATH_ENV = 'SIA_EMAIL_RULES'
+
+OPERATORS = {'>=': operator.ge, '>': operator.gt, '<=': operator.le, '<': operator.lt, '==': operator.eq,
+             '!=': operator.ne}
+
+
+class RuleError(ValueError):
+    """The rule file is malformed; the message says where"""
+
+
+def _compile_condition(condition, families, where):
+    """
+    Nested tuples instead of closures, so a RuleSet pickles into worker processes:
+    ('all', parts) / ('any', parts) / ('feature', name, op, value) / ('keyword', family, keyword)
+    """
+
+    if not isinstance(condition, dict):
+        raise RuleError(f"{where}: condition must be an object")
+    for combinator in ('all', 'any'):
+        if combinator in condition:
+            parts = condition[combinator]
+            if not isinstance(parts, list) or not parts:
+                raise RuleError(f"{where}.{combinator}: expected a non-empty list")
+            return (combinator, tuple(_compile_condition(part, families, f"{where}.{combinator}[{i}]")
+                                      for i, part in enumerate(parts)))
+    if 'feature' in condition:
+        if condition['feature'] not in FEATURES:
+            raise RuleError(f"{where}: unknown feature {condition['feature']!r}")
+        if condition.get('op') not in OPERATORS:
+            raise RuleError(f"{where}: op must be one of {', '.join(OPERATORS)}")
+        if not isinstance(condition.get('value'), (int, float)):
+            raise RuleError(f"{where}: value must be a number")
+        return ('feature', condition['feature'], OPERATORS[condition['op']], condition['value'])
+    if 'keyword' in condition:
+        if condition.get('family') not in families:
+            raise RuleError(f"{where}: unknown keyword family {condition.get('family')!r}")
+        return ('keyword', condition['family'], condition['keyword'].lower())
+    raise RuleError(f"{where}: expected all, any, feature or keyword")
+
+
+def evaluate(condition, features, hits):
+    kind = condition[0]
+    if kind == 'all':
+        return all(evaluate(part, features, hits) for part in condition[1])
+    if kind == 'any':
+        return any(evaluate(part, features, hits) for part in condition[1])
+    if kind == 'feature':
+        _, name, op, value = condition
+        return op(features[name], value)
+    _, family, keyword = condition
+    return keyword in hits[family]
+
+
+def _compile_verdict(verdict, where):
+    if verdict.get('class') not in THREAT_CLASSES:
+        raise RuleError(f"{where}: class must be one of {', '.join(THREAT_CLASSES)}")
+    probs = verdict.get('confidence_probs')
+    if not isinstance(probs, list) or len(probs) != len(THREAT_CLASSES):
+        raise RuleError(f"{where}: confidence_probs needs {len(THREAT_CLASSES)} values in THREAT_CLASSES order")
+    return verdict['class'], [float(p) for p in probs], str(verdict.get('reasoning', ''))
+
+
+class RuleSet:
+    """
+    A rule file compiled for scoring: one KeywordMatcher over every keyword
+    family plus the auth markers, per-family weights and the ordered
+    classification conditions. Immutable once built; a reload builds a new one.
+    """
+
+    def __init__(self, spec, source=''):
+        if not isinstance(spec, dict) or 'version' not in spec:
+            raise RuleError("rule file needs a top-level object with a version")
+        self.version = str(spec['version'])
+        self.source = source
+
+        families = spec.get('families', {})
+        self.families = {}
+        for name, family in families.items():
+            if name == 'auth':
+                raise RuleError("families.auth is reserved for the auth markers")
+            if family.get('feature') not in FEATURES:
+                raise RuleError(f"families.{name}: unknown feature {family.get('feature')!r}")
+            self.families[name] = (family['feature'], family.get('weight', 0))
+        self.matcher = KeywordMatcher({
+            **{name: family.get('keywords', []) for name, family in families.items()},
+            'auth': spec.get('auth', {}).get('markers', [])
+        })
+
+        urls = spec.get('urls', {})
+        self.ip_url_weight = urls.get('ip_url_weight', 0)
+        self.suspicious_tld_weight = urls.get('suspicious_tld_weight', 0)
+        self.blocklisted_weight = urls.get('blocklisted_weight', 0)
+        self.suspicious_tlds = {tld.lower().lstrip('.') for tld in urls.get('suspicious_tlds', [])}
+        self.auth_weight = spec.get('auth', {}).get('weight', 0)
+
+        # Negative / fearful tone: weight x share of negative sentences (0 weight turns VADER off)
+        sentiment = spec.get('sentiment', {})
+        self.sentiment_weight = sentiment.get('weight', 0)
+        self.negative_compound = sentiment.get('negative_compound', -0.05)
+        self.max_sentences = sentiment.get('max_sentences', 40)
+        self.max_threat_score = spec.get('max_threat_score', 100)
+
+        self.classifications = [
+            (_compile_condition(rule.get('when'), self.matcher.families, f"classifications[{i}].when"),)
+            + _compile_verdict(rule, f"classifications[{i}]")
+            for i, rule in enumerate(spec.get('classifications', []))
+        ]
+        self.default = _compile_verdict(spec.get('default', {}), 'default')
+
+        # Cache keys change with any edit, even one that forgets to bump the version
+        content = json.dumps(spec, sort_keys=True).encode()
+        self.fingerprint = f"{self.version}:{hashlib.sha256(content).hexdigest()[:12]}"
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as fh:
+            try:
+                spec = json.load(fh)
+            except json.JSONDecodeError as e:
+                raise RuleError(f"{path}: {e}") from e
+        return cls(spec, source=path)
+
+    def classify(self, features, hits):
+        """(class, confidence_probs, reasoning) of the first matching classification"""
+        for condition, name, probs, reasoning in self.classifications:
+            if evaluate(condition, features, hits):
+                return name, probs, reasoning
+        return self.default
+
+
+class RuleStore:
+    """
+    Serves the current RuleSet of a rule file and recompiles it when the
+    file changes (checked at most every check_interval seconds). The swap is
+    a single reference assignment, so callers that took a RuleSet keep
+    scoring with it; a file that fails to compile is logged and the previous
+    rules stay in service.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self._rules = RuleSet.from_file(path)
+        self._checked = time.monotonic()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self):
+        if time.monotonic() - self._checked >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked >= self.check_interval:
+                    self._reload_if_changed()
+                    self._checked = time.monotonic()
+        return self._rules
+
+    def _reload_if_changed(self):
+        try:
+            stamp = self._file_stamp()
+        except OSError:
+            logger.exception("Keeping email rules %s: cannot stat %s", self._rules.fingerprint, self.path)
+            return
+        if stamp == self._stamp:
+            return
+        # Remembered even on failure, so a broken file is reported once and not re-parsed every check
+        self._stamp = stamp
+        try:
+            rules = RuleSet.from_file(self.path)
+        except RuleError as e:
+            logger.error("Keeping email rules %s: %s", self._rules.fingerprint, e)
+            return
+        except Exception:
+            logger.exception("Keeping email rules %s: could not load %s", self._rules.fingerprint, self.path)
+            return
+        self._rules = rules
+        logger.info("Loaded email rules %s from %s", rules.fingerprint, self.path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_rule_store():
+    """Process-wide RuleStore for SIA_EMAIL_RULES (default: the shipped rules/email_rules.json)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RuleStore(os.environ.get(RULES_PATH_ENV) or DEFAULT_RULES_PATH)
+        return _store
+
+
+def get_rules():
+    """The RuleSet in service right now; take it once per classification"""
+    return get_rule_store().current()
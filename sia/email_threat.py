@@ -0,0 +1,137 @@
+from .domain_reputation import get_blocklist
+from .email_parser import DEFAULT_MAX_BODY_CHARS, parse_email
+from .email_rules import FEATURES, THREAT_CLASSES, get_rules
+from .sentiment import get_sentiment_scorer
+from .urls import extract_email_domains, extract_urls, get_public_suffixes
+
+# Bump whenever the scoring code changes so cached verdicts are not reused
+# (keywords, weights and thresholds live in the rule file; see email_rules)
+CLASSIFIER_VERSION = 4
+
+
+def keyword_features(email_lower, rules=None):
+    """Keyword-family features of a lowercased email, plus the keyword hits behind them"""
+
+    rules = rules or get_rules()
+    hits = rules.matcher.present(email_lower, lowered=True)
+
+    # Extract features like your model would
+    features = dict.fromkeys(FEATURES, 0)
+
+    # Each family (urgency, fraud, phishing, spam...) adds its weight per distinct keyword found
+    for family, (feature, weight) in rules.families.items():
+        features[feature] += weight * len(hits[family])
+
+    return features, hits
+
+
+def check_suspicious_patterns(features, hits, email_lower, auth_failure=False, rules=None):
+    """Fill in the URL and authentication features of keyword_features output"""
+
+    rules = rules or get_rules()
+
+    # Suspicious URL detection: IP-literal hosts, bad TLDs and blocklisted domains
+    urls = extract_urls(email_lower)
+    domains = {url.host for url in urls if not url.is_ip} | extract_email_domains(email_lower)
+    score_url_findings(features, hits, sum(1 for url in urls if url.is_ip), domains, rules)
+
+    # Authentication failure
+    if auth_failure or hits['auth']:
+        features['auth_failure'] = rules.auth_weight
+
+
+def score_url_findings(features, hits, ip_urls, domains, rules=None):
+    """suspicious_urls from the number of IP-literal URLs and the other hosts / sender domains of an email"""
+
+    rules = rules or get_rules()
+    suffixes = get_public_suffixes()
+    blocklist = get_blocklist()
+
+    hits['tld'] = {suffixes.public_suffix(domain) for domain in domains} & rules.suspicious_tlds
+    hits['blocklisted'] = set()
+    if blocklist is not None:
+        hits['blocklisted'] = {match for match in map(blocklist.lookup, domains) if match}
+    features['suspicious_urls'] = (ip_urls * rules.ip_url_weight + len(hits['tld']) * rules.suspicious_tld_weight
+                                   + len(hits['blocklisted']) * rules.blocklisted_weight)
+
+
+def check_sentiment(features, hits, email_text, rules=None):
+    """Fill in the pressure_tone feature from the VADER tone of the (original-case) email text"""
+
+    rules = rules or get_rules()
+    if not rules.sentiment_weight:
+        return
+
+    # Fear / pressure language reads as negative sentences; VADER needs the original case
+    sentiment = get_sentiment_scorer(rules.max_sentences, rules.negative_compound).score(email_text)
+    hits['sentiment'] = sentiment
+    features['pressure_tone'] = round(rules.sentiment_weight * sentiment['negative_share'])
+
+
+def extract_email_features(email_text, auth_failure=False, rules=None):
+    """
+    Threat features of an email plus the keyword hits behind them.
+    auth_failure marks an SPF/DKIM failure found by the header parser.
+    """
+
+    rules = rules or get_rules()
+    email_lower = email_text.lower()
+    features, hits = keyword_features(email_lower, rules)
+    check_suspicious_patterns(features, hits, email_lower, auth_failure, rules)
+    check_sentiment(features, hits, email_text, rules)
+    return features, hits
+
+
+def score_email_features(features, hits, rules=None):
+    """Threat score and class for features from extract_email_features"""
+
+    rules = rules or get_rules()
+
+    # Calculate total threat score
+    total_score = sum(features.values())
+
+    # Classification logic (like your trained model): first matching rule wins
+    classification, confidence_probs, reasoning = rules.classify(features, hits)
+    result = {
+        'threat_score': min(total_score, rules.max_threat_score),
+        'classification': classification,
+        'confidence_probs': list(confidence_probs),  # [Safe, Spam, Phishing, Fraud]
+        'features': features,
+        'reasoning': reasoning
+    }
+    if 'sentiment' in hits:
+        result['sentiment'] = hits['sentiment']
+    return result
+
+
+# PROPER Email Threat Classification (based on your LSTM model logic)
+def classify_email_threat(email_text, auth_failure=False, rules=None):
+    """
+    Proper email classification using threat pattern analysis
+    This mimics your Bidirectional LSTM model's classification logic
+    """
+
+    rules = rules or get_rules()
+    features, hits = extract_email_features(email_text, auth_failure, rules)
+    return score_email_features(features, hits, rules)
+
+
+def classify_message(raw, max_body_chars=DEFAULT_MAX_BODY_CHARS, rules=None, parsed=None, scored=None):
+    """
+    Classify a raw message (bytes or pasted text) through the header-aware parser:
+    only the headers and the first max_body_chars of decoded text body are
+    scanned, attachments are skipped and SPF/DKIM results are read from the
+    Authentication-Results / Received-SPF headers.
+    parsed / scored: the message's ParsedEmail and classify_email_threat
+    result, when the caller already has them.
+    """
+
+    if parsed is None:
+        parsed = parse_email(raw, max_body_chars)
+    if scored is not None:
+        result = dict(scored)
+    else:
+        result = classify_email_threat(parsed.scan_text(), auth_failure=parsed.auth_failed, rules=rules)
+    result['attachments'] = [attachment.describe() for attachment in parsed.attachments]
+    result['body_truncated'] = parsed.body_truncated
+    return result
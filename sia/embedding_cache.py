@@ -0,0 +1,250 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+
+import numpy as np
+
+from .video_frames import Frame, VideoInfo
+
+logger = logging.getLogger(__name__)
+
+# Directory of the cache and its size limit in MB (0 disables it)
+CACHE_DIR_ENV = 'SIA_EMBEDDING_CACHE'
+CACHE_MB_ENV = 'SIA_EMBEDDING_CACHE_MB'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sia', 'embeddings')
+DEFAULT_CACHE_MB = 2048
+HASH_CHUNK_BYTES = 1 << 20
+# Per-frame record columns: source frame index, timestamp, motion, embedding row (-1: not embedded)
+RECORD_COLUMNS = 4
+
+
+def video_fingerprint(path):
+    """Content hash (BLAKE2b) of a video file, read in 1 MB chunks"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CachedVideo:
+    """
+    One cache entry: the per-frame records and embeddings of a video,
+    memory-mapped read-only, plus the VideoInfo it was decoded with.
+    complete is True when every sampled frame was embedded (no motion gate).
+    """
+
+    def __init__(self, meta, records, embeddings):
+        self.meta = meta
+        self.records = records
+        self.embeddings = embeddings
+        self.info = VideoInfo(**meta['info'])
+        self.complete = meta['complete']
+
+    def frames(self):
+        """Frame objects carrying the cached embedding and motion (and no image), ready for ViolenceModel.scan"""
+        for index, timestamp, motion, row in self.records:
+            embedding = self.embeddings[int(row)] if row >= 0 else None
+            yield Frame(int(index), float(timestamp), None, embedding=embedding, motion=float(motion))
+
+
+class CacheWriter:
+    """
+    Records the frames of one scan as they go by and stores them as a cache
+    entry on commit(). Frames are only read window + batch frames after they
+    pass, once the scan has embedded them (or skipped them), and embeddings
+    are appended to disk straight away, so memory stays flat.
+    """
+
+    def __init__(self, cache, key, info, lag):
+        self.cache = cache
+        self.key = key
+        self.info = info
+        self._pending = deque()
+        self._lag = lag
+        self._records = []
+        self._rows = 0
+        self._dim = None
+        handle, self._embeddings_path = tempfile.mkstemp(prefix='.writing_', dir=cache.directory)
+        self._fh = os.fdopen(handle, 'wb')
+
+    def record(self, frames):
+        """Pass frames through, keeping track of them"""
+        for frame in frames:
+            self._pending.append(frame)
+            if len(self._pending) > self._lag:
+                self._store(self._pending.popleft())
+            yield frame
+
+    def _store(self, frame):
+        row = -1
+        if frame.embedding is not None:
+            embedding = np.asarray(frame.embedding, dtype=np.float32)
+            self._dim = embedding.shape[-1]
+            self._fh.write(embedding.tobytes())
+            row = self._rows
+            self._rows += 1
+        motion = frame.motion if frame.motion is not None else 0.0
+        self._records.append((frame.index, frame.timestamp, motion, row))
+
+    def commit(self):
+        """Store the entry (after the scan has finished with every frame)"""
+        while self._pending:
+            self._store(self._pending.popleft())
+        self._fh.close()
+        records = np.array(self._records, dtype=np.float64).reshape(-1, RECORD_COLUMNS)
+        meta = {
+            'frames': len(records),
+            'embedded': self._rows,
+            'dim': self._dim or 0,
+            'complete': self._rows == len(records),
+            'info': {'fps': self.info.fps, 'frame_count': self.info.frame_count, 'width': self.info.width,
+                     'height': self.info.height}
+        }
+        self.cache.put(self.key, meta, records, self._embeddings_path)
+
+    def discard(self):
+        self._fh.close()
+        with contextlib.suppress(OSError):
+            os.remove(self._embeddings_path)
+
+
+class EmbeddingCache:
+    """
+    Per-frame CNN embeddings of analyzed videos on disk, so re-analyzing a
+    clip (other threshold, smoothing, hop, a reopened session) skips decoding
+    and the CNN. Entries are keyed by the video's content hash, the sampling
+    rate and the model (ViolenceModel.cache_key), and are three files:
+    <key>.f32 (embeddings) and <key>.rec (per-frame records), both read back
+    memory-mapped, and <key>.json, whose mtime is the entry's last use.
+    Past max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(fingerprint, sample_fps, model):
+        parts = f"{fingerprint}:{sample_fps}:{model.frame_size}:{model.cache_key}"
+        return hashlib.blake2b(parts.encode(), digest_size=16).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key, complete=False):
+        """
+        The CachedVideo stored under key, or None (also when complete is
+        asked for and the entry is not); a hit marks the entry as just used
+        """
+        meta_path = self._path(key, '.json')
+        try:
+            with open(meta_path, encoding='utf-8') as fh:
+                meta = json.load(fh)
+            if complete and not meta['complete']:
+                raise KeyError('complete')
+            records = np.zeros((0, RECORD_COLUMNS))
+            embeddings = None
+            if meta['frames']:
+                records = np.memmap(self._path(key, '.rec'), dtype=np.float64, mode='r',
+                                    shape=(meta['frames'], RECORD_COLUMNS))
+            if meta['embedded']:
+                embeddings = np.memmap(self._path(key, '.f32'), dtype=np.float32, mode='r',
+                                       shape=(meta['embedded'], meta['dim']))
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedVideo(meta, records, embeddings)
+
+    def writer(self, key, info, lag):
+        """A CacheWriter for a scan about to run; lag: frames a frame may wait before the scan embeds it"""
+        return CacheWriter(self, key, info, lag)
+
+    def put(self, key, meta, records, embeddings_path):
+        """
+        Move a written entry into place, then evict. The metadata goes first
+        on replace and last on insert, so readers never see a partial entry.
+        """
+        with self._lock:
+            with contextlib.suppress(OSError):
+                os.remove(self._path(key, '.json'))
+            os.replace(embeddings_path, self._path(key, '.f32'))
+            handle, records_path = tempfile.mkstemp(prefix='.writing_', dir=self.directory)
+            with os.fdopen(handle, 'wb') as fh:
+                records.tofile(fh)
+            os.replace(records_path, self._path(key, '.rec'))
+            handle, meta_path = tempfile.mkstemp(prefix='.writing_', dir=self.directory)
+            with os.fdopen(handle, 'w', encoding='utf-8') as fh:
+                json.dump(meta, fh)
+            os.replace(meta_path, self._path(key, '.json'))
+            self._evict()
+
+    def _entries(self):
+        """{key: (last used, bytes)} of the stored entries"""
+        entries = {}
+        for name in os.listdir(self.directory):
+            key, suffix = os.path.splitext(name)
+            if suffix not in ('.json', '.rec', '.f32') or name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            used, size = entries.get(key, (0.0, 0))
+            entries[key] = (stat.st_mtime if suffix == '.json' else used, size + stat.st_size)
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size in entries.values())
+        for key, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            for suffix in ('.json', '.rec', '.f32'):
+                with contextlib.suppress(OSError):
+                    os.remove(self._path(key, suffix))
+            total -= size
+            logger.info("embedding cache: evicted %s (%.1f MB)", key, size / 1024 / 1024)
+
+    def describe(self):
+        entries = self._entries()
+        return {'directory': self.directory, 'entries': len(entries),
+                'bytes': sum(size for _, size in entries.values()), 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+_cache = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """
+    The process-wide EmbeddingCache in SIA_EMBEDDING_CACHE (default
+    ~/.cache/sia/embeddings), bounded by SIA_EMBEDDING_CACHE_MB. None when
+    the limit is 0 or the directory cannot be created.
+    """
+
+    global _cache, _cache_loaded
+    with _cache_lock:
+        if not _cache_loaded:
+            _cache_loaded = True
+            max_mb = float(os.environ.get(CACHE_MB_ENV, DEFAULT_CACHE_MB))
+            if max_mb > 0:
+                try:
+                    _cache = EmbeddingCache(os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR),
+                                            int(max_mb * 1024 * 1024))
+                except OSError:
+                    logger.exception("Could not open the embedding cache")
+        return _cache
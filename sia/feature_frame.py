@@ -0,0 +1,150 @@
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+from .email_rules import FEATURES, get_rules
+from .email_threat import check_suspicious_patterns
+from .sentiment import get_sentiment_scorer
+from .urls import SCHEME_SEPARATORS, WWW_PREFIXES
+
+# Rows per SentimentScorer.score_batch call
+SENTIMENT_CHUNK = 10000
+
+
+def _string_columns(texts):
+    """
+    Original-case texts as a list of Python strings (missing -> '') and the
+    lowercased ones as an Arrow large_string column. Lowercasing uses
+    str.lower itself: Arrow's utf8_lower differs for some characters ('İ'),
+    which would break parity with the per-message path.
+    """
+
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Corpus features require pyarrow (pip install pyarrow)") from e
+
+    texts = [text if isinstance(text, str) else '' for text in pd.Series(texts, dtype=object).tolist()]
+    return texts, pa.array((text.lower() for text in texts), type=pa.large_string(), size=len(texts))
+
+
+def _contains(lowered, *literals):
+    """
+    Boolean column: any of literals occurs in each row of the Arrow column.
+    One RE2 scan over the column's buffer (match_substring_regex); for
+    literals it measured 1.6x faster than str.__contains__ per row and 6x
+    faster than match_substring.
+    """
+    import pyarrow.compute as pc
+
+    pattern = '|'.join(re.escape(literal) for literal in literals)
+    return pc.match_substring_regex(lowered, pattern).to_numpy(zero_copy_only=False)
+
+
+def _evaluate(condition, columns, keyword_hits):
+    """Vectorized email_rules.evaluate over whole columns"""
+    kind = condition[0]
+    if kind == 'all':
+        return np.logical_and.reduce([_evaluate(part, columns, keyword_hits) for part in condition[1]])
+    if kind == 'any':
+        return np.logical_or.reduce([_evaluate(part, columns, keyword_hits) for part in condition[1]])
+    if kind == 'feature':
+        _, name, op, value = condition
+        return op(columns[name], value)
+    _, family, keyword = condition
+    return keyword_hits.get((family, keyword), np.zeros(len(columns[FEATURES[0]]), dtype=bool))
+
+
+def email_feature_frame(texts, auth_failure=False, rules=None, verdicts=False):
+    """
+    classify_email_threat(text, auth_failure)['features'] for every row of
+    texts, as an int64 DataFrame with the FEATURES columns and texts' index.
+    auth_failure may be a scalar or a boolean sequence aligned with texts.
+
+    Keyword families and auth markers are one columnar scan per keyword
+    (Arrow, see _contains), shared by every family that lists the keyword.
+    URL features need the exact extractor, so only rows containing a URL or
+    address marker take the per-message path; the rest are 0 without being
+    touched. VADER tone is scored with the batched, memoized SentimentScorer.
+    With verdicts=True, threat_score and classification columns are added
+    by evaluating the rules column-wise.
+    """
+
+    rules = rules or get_rules()
+    index = pd.Series(texts).index
+    texts, lowered = _string_columns(texts)
+    rows = len(texts)
+    columns = {name: np.zeros(rows, dtype=np.int64) for name in FEATURES}
+
+    # Keyword families: weight x distinct keywords present, as in keyword_features
+    keyword_hits = {}
+    present = {}
+    for family, keywords in rules.matcher.families.items():
+        for keyword in {kw.lower() for kw in keywords}:
+            if keyword not in present:
+                present[keyword] = _contains(lowered, keyword)
+            keyword_hits[(family, keyword)] = present[keyword]
+    for family, (feature, weight) in rules.families.items():
+        for keyword in {kw.lower() for kw in rules.matcher.families[family]}:
+            columns[feature] += weight * present[keyword]
+
+    # URL / sender-domain features: exact per-message path, only where a marker occurs
+    markers = _contains(lowered, *{literal.lower() for literal in SCHEME_SEPARATORS + WWW_PREFIXES + ('@',)})
+    for row in np.flatnonzero(markers):
+        features, hits = dict.fromkeys(FEATURES, 0), {'auth': ()}
+        check_suspicious_patterns(features, hits, lowered[int(row)].as_py(), rules=rules)
+        columns['suspicious_urls'][row] = features['suspicious_urls']
+
+    # Authentication failure: parser flag or an auth marker in the text
+    auth = np.broadcast_to(np.asarray(auth_failure, dtype=bool), (rows,)).copy()
+    for keyword in {kw.lower() for kw in rules.matcher.families['auth']}:
+        auth |= present[keyword]
+    columns['auth_failure'][auth] = rules.auth_weight
+
+    if rules.sentiment_weight:
+        scorer = get_sentiment_scorer(rules.max_sentences, rules.negative_compound)
+        for start in range(0, rows, SENTIMENT_CHUNK):
+            summaries = scorer.score_batch(texts[start:start + SENTIMENT_CHUNK])
+            # Python's round (banker's rounding) on each value, as check_sentiment does
+            columns['pressure_tone'][start:start + len(summaries)] = [
+                round(rules.sentiment_weight * summary['negative_share']) for summary in summaries]
+
+    frame = pd.DataFrame(columns, index=index)
+    if verdicts:
+        frame['threat_score'] = frame[FEATURES].sum(axis=1).clip(upper=rules.max_threat_score)
+        choices = [_evaluate(condition, columns, keyword_hits) for condition, *_ in rules.classifications]
+        labels = [name for _, name, _, _ in rules.classifications]
+        frame['classification'] = np.select(choices, labels, default=rules.default[0]) if choices \
+            else rules.default[0]
+    return frame
+
+
+def add_arguments(parser):
+    parser.add_argument('corpus', help="CSV or Parquet file with one email per row")
+    parser.add_argument('-o', '--output', required=True, help="Feature file to write (.csv or .parquet)")
+    parser.add_argument('--text-column', default='text', help="Column holding the email text")
+    parser.add_argument('--verdicts', action='store_true', help="Also write threat_score and classification")
+
+
+def run(args):
+    read = pd.read_parquet if args.corpus.lower().endswith(('.parquet', '.pq')) else pd.read_csv
+    corpus = read(args.corpus)
+    frame = email_feature_frame(corpus[args.text_column], verdicts=args.verdicts)
+    result = pd.concat([corpus.drop(columns=[args.text_column]), frame], axis=1)
+    if args.output.lower().endswith(('.parquet', '.pq')):
+        result.to_parquet(args.output, index=False)
+    else:
+        result.to_csv(args.output, index=False)
+    print(f"Wrote features for {len(frame)} emails -> {args.output}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Email threat features for a whole corpus (CSV or Parquet)")
+    add_arguments(parser)
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
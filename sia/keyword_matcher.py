@@ -0,0 +1,66 @@
+class KeywordMatcher:
+    """
+    Compiled keyword table for several keyword families.
+
+    Keywords are lowercased and de-duplicated across families once, when the
+    matcher is built, and the text is lowercased once per scan. Each distinct
+    keyword is then located with str.find, which runs in C and is several
+    times faster in CPython than a single pass of a combined regex.
+    """
+
+    def __init__(self, families):
+        self.families = {family: list(keywords) for family, keywords in families.items()}
+
+        # keyword -> families it belongs to (the same keyword may sit in several lists)
+        self._owners = {}
+        for family, keywords in self.families.items():
+            for kw in keywords:
+                owners = self._owners.setdefault(kw.lower(), [])
+                if family not in owners:
+                    owners.append(family)
+
+        # Longest keywords first: a keyword contained in a longer one that was
+        # already found is known to be present without searching for it
+        self._keywords = sorted(self._owners, key=len, reverse=True)
+        self._contained = {
+            kw: [other for other in self._keywords if other != kw and other in kw]
+            for kw in self._keywords
+        }
+        self.max_keyword_length = max((len(kw) for kw in self._keywords), default=0)
+
+    def present(self, text, lowered=False, start=0, end=None):
+        """Return {family: set(keywords)} for the keywords that occur in text"""
+
+        text = text if lowered else text.lower()
+        end = len(text) if end is None else end
+        found = set()
+        for kw in self._keywords:
+            if kw not in found and text.find(kw, start, end) != -1:
+                found.add(kw)
+                found.update(self._contained[kw])
+
+        hits = {family: set() for family in self.families}
+        for kw in found:
+            for family in self._owners[kw]:
+                hits[family].add(kw)
+        return hits
+
+    def scan(self, text, lowered=False, start=0, end=None):
+        """
+        Return {family: {keyword: [offsets]}} with every (possibly overlapping)
+        occurrence. Offsets index the lowercased text.
+        """
+
+        text = text if lowered else text.lower()
+        end = len(text) if end is None else end
+        hits = {family: {} for family in self.families}
+        for kw in self._keywords:
+            offsets = []
+            pos = text.find(kw, start, end)
+            while pos != -1:
+                offsets.append(pos)
+                pos = text.find(kw, pos + 1, end)
+            if offsets:
+                for family in self._owners[kw]:
+                    hits[family][kw] = offsets
+        return hits
@@ -0,0 +1,268 @@
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from .email_parser import DEFAULT_MAX_BODY_CHARS, ParsedEmail, parse_email, plain_body, split_header_block
+from .email_rules import FEATURES, get_rules
+from .email_threat import score_email_features, score_url_findings
+from .sentiment import MAX_SENTENCE_CHARS, get_sentiment_scorer
+from .urls import extract_email_domains, extract_urls
+
+# Greek capital sigma lowercases by context (final or not): text holding one is lowercased whole
+CONTEXT_LOWER = 'Σ'
+
+
+def _common_prefix(a, b):
+    """Length of the common prefix, by binary search over slice comparisons (memcmp, not a Python loop)"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _diff(old, new):
+    """(start, old_end, new_end) of the span between the common prefix and suffix of old and new"""
+    start = _common_prefix(old, new)
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - start)
+    return start, len(old) - suffix, len(new) - suffix
+
+
+def _line_findings(text):
+    """(IP-literal URL count, Counter of other hosts and sender domains per line) of lowercased lines"""
+    ip_urls, domains = 0, Counter()
+    for line in text.split('\n'):
+        urls = extract_urls(line)
+        ip_urls += sum(1 for url in urls if url.is_ip)
+        domains.update({url.host for url in urls if not url.is_ip} | extract_email_domains(line))
+    return ip_urls, domains
+
+
+class LiveEmailScorer:
+    """
+    Pattern verdict of an email that is being edited, kept up to date edit by edit.
+
+    update() gets the whole text and, when the input reports it, the edited
+    span; the caller debounces, so every update rescores. The text is read
+    as the Analyze button reads it (parse_email: headers, decoded MIME
+    bodies, SPF/DKIM results), but only the part an edit touched is redone:
+
+    - Parse: a message with a plain body (one text part, no transfer
+      encoding) keeps its previous parse. A body edit re-slices the body and
+      an edit inside the header block re-parses the headers; anything else
+      is parsed again.
+    - Keywords: every occurrence is kept as an offset into the lowercased
+      scan text. Only offsets inside the edit (widened by the longest
+      keyword, so matches straddling its ends are found) are searched again
+      and later ones are shifted; the lowercased text is spliced, not redone.
+    - URLs and addresses never cross a line break: the lines the edit spans
+      are extracted again and their findings swapped into running totals.
+    - Tone: VADER reads only the first sentences and is re-scored only when
+      the edit reaches into them.
+
+    Results are score_email_features output, identical to classify_message
+    on the same text. result['live'] describes the last update: elapsed_ms,
+    parse ('body', 'headers' or 'full'), keyword_chars and line_chars (the
+    characters searched again for keywords and for URLs).
+    """
+
+    def __init__(self, rules=None, max_body_chars=DEFAULT_MAX_BODY_CHARS):
+        self.max_body_chars = max_body_chars
+        self._pinned = rules
+        self._reset(rules or get_rules())
+
+    def _reset(self, rules):
+        self.rules = rules
+        self._family_keywords = {family: {kw.lower() for kw in keywords}
+                                 for family, keywords in rules.matcher.families.items()}
+        self._offsets = {kw: [] for keywords in self._family_keywords.values() for kw in keywords}
+        # _raw is None until the first update, which is a full one
+        self._raw = None
+        self._parsed = None
+        self._header_end = self._body_start = 0
+        self._plain = False
+        self._scan = ''
+        self._lower = ''
+        # Whether lowercasing the scan text piecewise gives the same string as lowercasing it whole
+        self._splice_lower = True
+        self._auth_failed = False
+        self._ip_urls, self._domains = 0, Counter()
+        self._tone = None
+        self._live = {'elapsed_ms': 0.0, 'parse': 'full', 'keyword_chars': 0, 'line_chars': 0}
+
+    def _reported_edit(self, text, edit):
+        """The edit as reported when it fits the previous and current text, else as found by comparing them"""
+        old = self._raw
+        if edit is not None:
+            start, old_end, new_end = edit
+            if (0 <= start <= old_end <= len(old) and start <= new_end <= len(text)
+                    and len(old) - old_end == len(text) - new_end
+                    and old[start - 1:start] == text[start - 1:start]
+                    and old[old_end:old_end + 1] == text[new_end:new_end + 1]):
+                return start, old_end, new_end
+        return _diff(old, text)
+
+    def _plain_parse(self, text, headers, header_end, body_start):
+        """The ParsedEmail parse_email returns for text when its body is plain (see email_parser.plain_body)"""
+        parsed = ParsedEmail()
+        parsed.headers = headers
+        parsed.header_text = text[:header_end]
+        body = text[body_start:body_start + self.max_body_chars]
+        if self.max_body_chars > 0:
+            parsed.body_parts.append(body)
+            parsed.body_chars = len(body)
+        parsed.body_truncated = len(text) - body_start > self.max_body_chars
+        return parsed
+
+    def _reparse(self, text, edit):
+        """
+        Parse text, reusing the previous parse where the edit allows.
+        Returns (parse mode, the edit as a span of the scan text or None when
+        it is to be found by comparing the scan texts).
+        """
+
+        old_raw, parsed = self._raw, self._parsed
+        if old_raw is not None and self._plain:
+            start, old_end, new_end = self._reported_edit(text, edit)
+            header_end, body_start = self._header_end, self._body_start
+            if parsed.headers is None:
+                # Headerless text stays a body unless the edit makes its start read as a header block
+                if split_header_block(text)[0] is None:
+                    self._parsed = self._plain_parse(text, None, 0, 0)
+                    return 'body', self._body_span(start, old_end, new_end, 0, 0, len(old_raw), len(text))
+            elif start >= body_start:
+                self._parsed = self._plain_parse(text, parsed.headers, header_end, body_start)
+                offset = header_end + 2
+                return 'body', self._body_span(start, old_end, new_end, body_start, offset, len(old_raw), len(text))
+            elif old_end <= header_end:
+                headers, new_header_end, new_body_start = split_header_block(text)
+                shift = new_end - old_end
+                if (headers is not None and plain_body(headers) and new_header_end == header_end + shift
+                        and new_body_start == body_start + shift):
+                    # Header lines were edited: scan offsets are raw offsets up to the header end
+                    self._parsed = self._plain_parse(text, headers, new_header_end, new_body_start)
+                    self._header_end, self._body_start = new_header_end, new_body_start
+                    return 'headers', (start, old_end, new_end)
+
+        self._parsed = parse_email(text, self.max_body_chars)
+        headers, self._header_end, self._body_start = split_header_block(text)
+        self._plain = plain_body(headers)
+        return 'full', None
+
+    def _body_span(self, start, old_end, new_end, body_start, offset, old_len, new_len):
+        """Map a raw edit at or after body_start to the scan text, where the body starts at offset"""
+        limit = self.max_body_chars
+        span = [offset + min(max(pos - body_start, 0), limit) for pos in (start, old_end, new_end)]
+        if old_len - body_start > limit or new_len - body_start > limit:
+            # The body is cut at max_body_chars: what the edit pushed out of (or into) the window changes too
+            span[1] = len(self._scan)
+            span[2] = len(self._parsed.scan_text())
+        return tuple(span)
+
+    def _lowered(self, scan, span):
+        """The lowercased scan text and the edit as a span of it"""
+        old_lower = self._lower
+        if span is not None and self._splice_lower:
+            start, old_end, new_end = span
+            piece = scan[start:new_end]
+            lowered = piece.lower()
+            if len(lowered) == len(piece) and CONTEXT_LOWER not in piece:
+                return old_lower[:start] + lowered + old_lower[old_end:], span
+        lower = scan.lower()
+        self._splice_lower = len(lower) == len(scan) and CONTEXT_LOWER not in scan
+        return lower, _diff(old_lower, lower)
+
+    def _rescan(self, lower, start, old_end, new_end):
+        """Bring keyword offsets and URL findings up to date with an edit; (keyword chars, line chars) searched"""
+        old_lower = self._lower
+        shift = new_end - old_end
+
+        # A match starting before low ends inside the common prefix, one starting at old_end or later
+        # lies in the common suffix: only the offsets in between are searched again
+        low = max(0, start - self.rules.matcher.max_keyword_length + 1)
+        high = min(new_end + self.rules.matcher.max_keyword_length - 1, len(lower))
+        for kw, offsets in self._offsets.items():
+            first, last = bisect_left(offsets, low), bisect_left(offsets, old_end)
+            found = []
+            pos = lower.find(kw, low, new_end + len(kw) - 1)
+            while pos != -1:
+                found.append(pos)
+                pos = lower.find(kw, pos + 1, new_end + len(kw) - 1)
+            offsets[first:] = found + [offset + shift for offset in offsets[last:]]
+
+        # Swap the findings of the lines the edit spans, before and after it
+        line_start = old_lower.rfind('\n', 0, start) + 1
+        old_line_end = old_lower.find('\n', old_end)
+        old_line_end = len(old_lower) if old_line_end == -1 else old_line_end
+        new_line_end = old_line_end + shift
+        old_ip_urls, old_domains = _line_findings(old_lower[line_start:old_line_end])
+        new_ip_urls, new_domains = _line_findings(lower[line_start:new_line_end])
+        self._ip_urls += new_ip_urls - old_ip_urls
+        self._domains.update(new_domains)
+        self._domains.subtract(old_domains)
+        self._domains = +self._domains
+        return high - low, new_line_end - line_start
+
+    def update(self, text, edit=None):
+        """
+        Score text (the whole current content, headers included). edit is the
+        (start, old_end, new_end) the input reports: the previous text's
+        [start, old_end) was replaced by text[start:new_end]. Without it (or
+        when it does not fit) the edit is found by comparing the two texts.
+        """
+
+        rules = self._pinned or get_rules()
+        if rules is not self.rules:
+            # Rules were reloaded: keyword sets may differ, start over
+            self._reset(rules)
+        if text != self._raw:
+            started = time.perf_counter()
+            parse, span = self._reparse(text, edit)
+            scan = self._parsed.scan_text()
+            lower, (start, old_end, new_end) = self._lowered(scan, span)
+            keyword_chars, line_chars = self._rescan(lower, start, old_end, new_end)
+
+            window = rules.max_sentences * MAX_SENTENCE_CHARS
+            if rules.sentiment_weight and (self._tone is None or start < window or not self._splice_lower):
+                self._tone = get_sentiment_scorer(rules.max_sentences, rules.negative_compound).score(scan[:window])
+
+            self._raw, self._scan, self._lower = text, scan, lower
+            if parse != 'body':
+                self._auth_failed = self._parsed.auth_failed
+            self._live = {'elapsed_ms': (time.perf_counter() - started) * 1000, 'parse': parse,
+                          'keyword_chars': keyword_chars, 'line_chars': line_chars}
+        return self._score()
+
+    def _score(self):
+        rules = self.rules
+        features = dict.fromkeys(FEATURES, 0)
+        hits = {family: {kw for kw in keywords if self._offsets[kw]}
+                for family, keywords in self._family_keywords.items()}
+        for family, (feature, weight) in rules.families.items():
+            features[feature] += weight * len(hits[family])
+
+        score_url_findings(features, hits, self._ip_urls, set(self._domains), rules)
+        if self._auth_failed or hits['auth']:
+            features['auth_failure'] = rules.auth_weight
+
+        if rules.sentiment_weight and self._tone is not None:
+            hits['sentiment'] = dict(self._tone)
+            features['pressure_tone'] = round(rules.sentiment_weight * self._tone['negative_share'])
+
+        result = score_email_features(features, hits, rules)
+        result['live'] = dict(self._live)
+        return result
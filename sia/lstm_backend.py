@@ -0,0 +1,172 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from .email_parser import DEFAULT_MAX_BODY_CHARS, parse_email
+from .email_threat import THREAT_CLASSES, classify_email_threat, classify_message
+
+logger = logging.getLogger(__name__)
+
+# Saved Keras model (.keras / .h5) and its Tokenizer JSON (tokenizer.to_json())
+MODEL_PATH_ENV = 'SIA_EMAIL_MODEL'
+TOKENIZER_PATH_ENV = 'SIA_EMAIL_TOKENIZER'
+DEFAULT_MAXLEN = 200
+
+
+def pad_sequences(sequences, maxlen, padding='pre', truncating='pre'):
+    """Fixed-length int32 matrix, same conventions as keras pad_sequences"""
+    batch = np.zeros((len(sequences), maxlen), dtype=np.int32)
+    for row, seq in enumerate(sequences):
+        if not seq:
+            continue
+        seq = seq[-maxlen:] if truncating == 'pre' else seq[:maxlen]
+        if padding == 'pre':
+            batch[row, -len(seq):] = seq
+        else:
+            batch[row, :len(seq)] = seq
+    return batch
+
+
+class LSTMEmailModel:
+    """
+    The Bidirectional LSTM email classifier: a saved Keras model plus the
+    tokenizer it was trained with. Output classes follow THREAT_CLASSES.
+
+    Requests from concurrent callers (Streamlit sessions are threads) are
+    queued and a single worker thread groups them into one forward pass of up
+    to max_batch emails, waiting at most max_wait_ms for a batch to fill.
+    """
+
+    def __init__(self, model_path, tokenizer_path, maxlen=DEFAULT_MAXLEN, padding='pre',
+                 max_batch=32, max_wait_ms=10, max_body_chars=DEFAULT_MAX_BODY_CHARS):
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+        with open(tokenizer_path, encoding='utf-8') as fh:
+            self.tokenizer = tf.keras.preprocessing.text.tokenizer_from_json(fh.read())
+
+        self.maxlen = maxlen
+        self.padding = padding
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_body_chars = max_body_chars
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._serve, name='lstm-email-batcher', daemon=True)
+        self._worker.start()
+
+    def encode(self, texts):
+        """Tokenize, then pad/truncate to the model's fixed input length"""
+        return pad_sequences(self.tokenizer.texts_to_sequences(texts), self.maxlen,
+                             padding=self.padding, truncating=self.padding)
+
+    def predict(self, texts):
+        """Class probabilities for a list of texts in one forward pass"""
+        if not texts:
+            return np.zeros((0, len(THREAT_CLASSES)), dtype=np.float32)
+        return np.asarray(self.model(self.encode(texts), training=False))
+
+    def submit(self, text):
+        """Queue one text for the next micro-batch; returns a Future of its probabilities"""
+        future = Future()
+        self._requests.put((text, future))
+        return future
+
+    def _serve(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                probs = self.predict([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), row in zip(batch, probs):
+                future.set_result(row)
+
+    def model_text(self, raw, parsed=None):
+        """Subject and bounded body, the text the LSTM was trained on"""
+        if parsed is None:
+            parsed = parse_email(raw, self.max_body_chars)
+        return parsed, f"{parsed.subject}\n{parsed.body_text}"
+
+    def classify(self, raw, parsed=None, scored=None):
+        """
+        Same result contract as classify_message: the LSTM decides
+        classification / confidence_probs / threat_score, the pattern
+        features still drive the threat vector report. parsed / scored
+        (ParsedEmail, pattern result) are reused when the caller has them.
+        """
+
+        parsed, text = self.model_text(raw, parsed)
+        probs = [float(p) for p in self.submit(text).result()]
+        best = int(np.argmax(probs))
+
+        if scored is not None:
+            result = dict(scored)
+        else:
+            result = classify_email_threat(parsed.scan_text(), auth_failure=parsed.auth_failed)
+        result['classification'] = THREAT_CLASSES[best]
+        result['confidence_probs'] = probs
+        result['threat_score'] = round((1 - probs[0]) * 100)
+        result['reasoning'] = f"Bidirectional LSTM: {THREAT_CLASSES[best]} ({probs[best]:.1%} confidence)"
+        result['attachments'] = [attachment.describe() for attachment in parsed.attachments]
+        result['body_truncated'] = parsed.body_truncated
+        return result
+
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def get_email_model():
+    """
+    The process-wide LSTMEmailModel, loaded on first use from SIA_EMAIL_MODEL /
+    SIA_EMAIL_TOKENIZER. None when no model is configured or it fails to load.
+    """
+
+    global _model, _model_loaded
+    with _model_lock:
+        if not _model_loaded:
+            _model_loaded = True
+            model_path = os.environ.get(MODEL_PATH_ENV)
+            tokenizer_path = os.environ.get(TOKENIZER_PATH_ENV)
+            if model_path and tokenizer_path:
+                try:
+                    _model = LSTMEmailModel(model_path, tokenizer_path,
+                                            maxlen=int(os.environ.get('SIA_EMAIL_MAXLEN', DEFAULT_MAXLEN)))
+                except Exception:
+                    logger.exception("Could not load the email LSTM model from %s", model_path)
+        return _model
+
+
+def backend_name():
+    """'lstm' when the LSTM serves classifications, 'patterns' otherwise"""
+    return 'lstm' if get_email_model() is not None else 'patterns'
+
+
+def classify_email(raw, parsed=None, scored=None):
+    """
+    Classify with the LSTM when one is configured, otherwise with the pattern
+    classifier; parsed / scored as in classify_message
+    """
+
+    model = get_email_model()
+    if model is None:
+        return classify_message(raw, parsed=parsed, scored=scored)
+    return model.classify(raw, parsed, scored)
@@ -0,0 +1,256 @@
+import argparse
+import csv
+import mailbox
+import os
+from functools import partial
+
+from .campaigns import CampaignTriage
+from .email_cache import ClassificationCache
+from .email_parser import DEFAULT_MAX_BODY_CHARS
+from .email_rules import get_rules
+from .email_threat import CLASSIFIER_VERSION, classify_message
+from .parallel_triage import ParallelTriage
+
+# Feature columns written for every message (same keys as classify_email_threat)
+FEATURE_COLUMNS = [
+    'urgency_score',
+    'suspicious_urls',
+    'fraud_indicators',
+    'phishing_indicators',
+    'spam_indicators',
+    'auth_failure',
+    'pressure_tone'
+]
+RESULT_COLUMNS = ['source', 'message_key', 'classification', 'threat_score'] + FEATURE_COLUMNS
+# Added when messages are grouped into campaigns (--campaigns)
+CAMPAIGN_COLUMNS = ['campaign_id', 'campaign_similarity']
+
+
+def iter_messages(source):
+    """
+    Stream (source, key, raw bytes) for every message in an mbox file, a Maildir,
+    a single .eml file or a directory tree of .eml files.
+    Only one message is held in memory at a time.
+    """
+
+    if os.path.isdir(source):
+        if all(os.path.isdir(os.path.join(source, sub)) for sub in ('cur', 'new', 'tmp')):
+            box = mailbox.Maildir(source, factory=None, create=False)
+            for key in box.iterkeys():
+                yield source, key, box.get_bytes(key)
+            return
+
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith('.eml'):
+                    path = os.path.join(root, name)
+                    with open(path, 'rb') as fh:
+                        yield path, name, fh.read()
+        return
+
+    if source.lower().endswith('.eml'):
+        with open(source, 'rb') as fh:
+            yield source, os.path.basename(source), fh.read()
+        return
+
+    # Anything else is treated as an mbox file; mbox only indexes message offsets
+    box = mailbox.mbox(source, factory=None, create=False)
+    try:
+        for key in box.iterkeys():
+            yield source, key, box.get_bytes(key)
+    finally:
+        box.close()
+
+
+def result_row(source, key, result):
+    """Flatten a classify_email_threat result into one output row"""
+    row = {
+        'source': source,
+        'message_key': str(key),
+        'classification': result['classification'],
+        'threat_score': result['threat_score']
+    }
+    for column in FEATURE_COLUMNS:
+        row[column] = result['features'][column]
+    for column in CAMPAIGN_COLUMNS:
+        if column in result:
+            row[column] = result[column]
+    return row
+
+
+class CsvResultWriter:
+    """Appends result rows to a CSV file as they are produced"""
+
+    def __init__(self, path, columns=RESULT_COLUMNS):
+        self._fh = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._fh, fieldnames=columns)
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def close(self):
+        self._fh.close()
+
+
+class ParquetResultWriter:
+    """Appends result rows to a Parquet file, one row group per batch"""
+
+    def __init__(self, path, batch_size=10000, columns=RESULT_COLUMNS):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)") from e
+
+        self._pa = pa
+        types = {'source': pa.string(), 'message_key': pa.string(), 'classification': pa.string(),
+                 'campaign_similarity': pa.float64()}
+        self._schema = pa.schema([(column, types.get(column, pa.int64())) for column in columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch_size = batch_size
+        self._rows = []
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self._batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            columns = {name: [row[name] for row in self._rows] for name in self._schema.names}
+            self._writer.write_table(self._pa.table(columns, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_result_writer(path, fmt=None, columns=RESULT_COLUMNS):
+    """Pick the writer from fmt ('csv' / 'parquet') or from the file extension"""
+    fmt = fmt or ('parquet' if path.lower().endswith(('.parquet', '.pq')) else 'csv')
+    if fmt == 'parquet':
+        return ParquetResultWriter(path, columns=columns)
+    if fmt == 'csv':
+        return CsvResultWriter(path, columns=columns)
+    raise ValueError(f"Unsupported output format: {fmt}")
+
+
+def classify_mailbox(sources, output_path, fmt=None, cache=None, workers=1, stats=None,
+                     max_body_chars=DEFAULT_MAX_BODY_CHARS, campaigns=None, rules=None):
+    """
+    Classify every message found in sources and write one row per message
+    to output_path. Returns a count of messages per classification.
+    Only the first max_body_chars of each message's text body are scanned.
+    With a ClassificationCache, repeated content (campaign waves) is scored once.
+    With workers > 1, messages are classified on a process pool (output order
+    is unchanged) and the pool's throughput stats are stored in the stats dict.
+    With a CampaignTriage, near-duplicate messages share their campaign
+    representative's verdict and representatives are classified by the
+    triage's own classify function; this runs in a single process.
+    The whole run scores with one rule set (default: the rules in service when
+    it starts), so a rule reload never splits a batch across two versions.
+    """
+
+    if isinstance(sources, str):
+        sources = [sources]
+
+    classify = partial(classify_message, max_body_chars=max_body_chars, rules=rules or get_rules())
+    messages = (((origin, key), raw) for source in sources for origin, key, raw in iter_messages(source))
+    columns = RESULT_COLUMNS
+    if campaigns is not None:
+        triage = None
+        columns = RESULT_COLUMNS + CAMPAIGN_COLUMNS
+        results = ((tag, campaigns.classify(raw, tag=f"{tag[0]}:{tag[1]}")) for tag, raw in messages)
+    elif workers > 1:
+        triage = ParallelTriage(workers=workers, cache=cache, classify=classify)
+        results = triage.map(messages)
+    else:
+        triage = None
+        results = ((tag, cache.classify(raw, classify) if cache is not None else classify(raw))
+                   for tag, raw in messages)
+
+    counts = {}
+    writer = open_result_writer(output_path, fmt, columns)
+    try:
+        for (origin, key), result in results:
+            writer.write(result_row(origin, key, result))
+            counts[result['classification']] = counts.get(result['classification'], 0) + 1
+    finally:
+        writer.close()
+
+    if triage is not None and stats is not None:
+        stats.update(triage.stats())
+    return counts
+
+
+def add_arguments(parser):
+    parser.add_argument('sources', nargs='+', help="mbox files, Maildir directories, .eml files or directories of .eml files")
+    parser.add_argument('-o', '--output', required=True, help="Result file (.csv or .parquet)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="Override the output format")
+    parser.add_argument('--cache', metavar='PATH', help="SQLite file for the persistent result cache")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="Worker processes (0 = one per CPU core)")
+    parser.add_argument('--max-body-chars', type=int, default=DEFAULT_MAX_BODY_CHARS,
+                        help="Decoded body characters scanned per message")
+    parser.add_argument('--campaigns', action='store_true',
+                        help="Group near-duplicate messages into campaigns and classify one per campaign")
+    parser.add_argument('--campaign-threshold', type=float, default=0.8,
+                        help="Estimated Jaccard similarity needed to join a campaign")
+    parser.add_argument('--campaign-report', metavar='PATH', help="Write one CSV row per campaign")
+
+
+def run(args):
+    workers = args.workers or os.cpu_count() or 1
+    rules = get_rules()
+    # Verdicts depend on the rules and the body limit, so both are part of the cache key
+    cache = ClassificationCache(disk_path=args.cache,
+                                version=f"{CLASSIFIER_VERSION}:{rules.fingerprint}:{args.max_body_chars}")
+    pool_stats = {}
+    campaigns = None
+    if args.campaigns:
+        classify = partial(cache.classify,
+                           classify=partial(classify_message, max_body_chars=args.max_body_chars, rules=rules))
+        campaigns = CampaignTriage(classify, threshold=args.campaign_threshold, max_body_chars=args.max_body_chars)
+    try:
+        counts = classify_mailbox(args.sources, args.output, args.format, cache=cache,
+                                  workers=workers, stats=pool_stats, max_body_chars=args.max_body_chars,
+                                  campaigns=campaigns, rules=rules)
+    finally:
+        cache.close()
+    total = sum(counts.values())
+    print(f"Classified {total} messages -> {args.output} (rules {rules.version})")
+    for classification, count in sorted(counts.items()):
+        print(f"  {classification}: {count}")
+    stats = cache.stats()
+    print(f"Cache: {stats['hits']} hits ({stats['disk_hits']} from disk), {stats['misses']} misses")
+    if campaigns is not None:
+        campaign_stats = campaigns.stats()
+        print(f"Campaigns: {campaign_stats['campaigns']} campaigns, "
+              f"{campaign_stats['propagated']} verdicts propagated from a representative")
+        report = campaigns.campaigns()
+        for campaign in report[:10]:
+            if campaign['size'] > 1:
+                print(f"  campaign {campaign['campaign_id']}: {campaign['size']} messages, "
+                      f"{campaign['classification']} (representative {campaign['representative']})")
+        if args.campaign_report:
+            with open(args.campaign_report, 'w', newline='', encoding='utf-8') as fh:
+                writer = csv.DictWriter(fh, fieldnames=['campaign_id', 'size', 'classification',
+                                                        'threat_score', 'representative'])
+                writer.writeheader()
+                writer.writerows(report)
+    if pool_stats:
+        print(f"Throughput: {pool_stats['messages_per_sec']:.1f} messages/sec over {len(pool_stats['workers'])} workers")
+        for pid, worker in sorted(pool_stats['workers'].items()):
+            print(f"  worker {pid}: {worker['messages']} messages, {worker['messages_per_sec']:.1f} messages/sec")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk email threat classification for mbox / Maildir / .eml archives")
+    add_arguments(parser)
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
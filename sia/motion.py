@@ -0,0 +1,63 @@
+import numpy as np
+
+# Grayscale resolution motion is measured at (width, height)
+GATE_SIZE = (64, 64)
+# Gray levels a pixel must change by between sampled frames to count as moving
+PIXEL_DELTA = 15
+# Share of moving pixels that makes a frame worth sending to the model
+DEFAULT_MOTION_THRESHOLD = 0.02
+# Share of moving pixels reported as motion intensity 10/10
+FULL_MOTION = 0.25
+
+
+class MotionGate:
+    """
+    Frame differencing on small grayscale copies of the sampled frames.
+    measure() returns the share of pixels that changed since the previous
+    frame; frames at or above threshold are moving. Only running totals are
+    kept, so memory is constant however long the video.
+    """
+
+    def __init__(self, threshold=DEFAULT_MOTION_THRESHOLD, pixel_delta=PIXEL_DELTA, size=GATE_SIZE):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.size = size
+        self._previous = None
+        self.frames_measured = 0
+        self.moving_frames = 0
+        self._moving_total = 0.0
+
+    def measure(self, image):
+        """Share of moving pixels in image (RGB uint8) relative to the previous call; the first frame is 0"""
+
+        import cv2
+
+        gray = cv2.cvtColor(cv2.resize(image, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_RGB2GRAY)
+        # A light blur keeps sensor noise and compression artefacts from counting as motion
+        gray = cv2.GaussianBlur(gray, (3, 3), 0)
+        previous, self._previous = self._previous, gray
+        if previous is None:
+            motion = 0.0
+        else:
+            motion = int(np.count_nonzero(cv2.absdiff(gray, previous) > self.pixel_delta)) / gray.size
+        return self.record(motion)
+
+    def record(self, motion):
+        """Count a motion value as the next frame's (measure() does; a cached value can be replayed) and return it"""
+        self.frames_measured += 1
+        if self.is_moving(motion):
+            self.moving_frames += 1
+            self._moving_total += motion
+        return motion
+
+    def is_moving(self, motion):
+        return motion >= self.threshold
+
+    def motion_intensity(self):
+        """
+        0-10 scale from the mean motion of the moving frames: how violent the
+        movement is when something moves, however much static footage surrounds it
+        """
+        if not self.moving_frames:
+            return 0.0
+        return round(10 * min(1.0, self._moving_total / self.moving_frames / FULL_MOTION), 1)
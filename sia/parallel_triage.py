@@ -0,0 +1,103 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .email_threat import classify_message
+
+
+def _classify_chunk(classify, texts):
+    """Worker side: classify a chunk of emails and report who did it and how long it took"""
+    start = time.perf_counter()
+    results = [classify(text) for text in texts]
+    return os.getpid(), time.perf_counter() - start, results
+
+
+class ParallelTriage:
+    """
+    Shards a stream of emails across a process pool.
+
+    The stream is cut into chunks (amortizing pickling/IPC per message) and at
+    most max_in_flight chunks are queued at any time, so arbitrarily large
+    archives run in bounded memory. Results come back in input order.
+    With a ClassificationCache, cached messages are answered in the parent
+    and never shipped to a worker. classify must be picklable (a module-level
+    function or a functools.partial of one).
+    """
+
+    def __init__(self, workers=None, chunk_size=64, max_in_flight=None, cache=None, classify=classify_message):
+        self.workers = workers or os.cpu_count() or 1
+        self.classify = classify
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.cache = cache
+        self._worker_stats = {}
+        self._messages = 0
+        self._elapsed = 0.0
+
+    def map(self, items):
+        """
+        items: iterable of (tag, raw message). Yields (tag, result) in input order.
+        """
+
+        start = time.perf_counter()
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            chunk = []
+            for item in items:
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    pending.append(self._submit(pool, chunk))
+                    chunk = []
+                    while len(pending) >= self.max_in_flight:
+                        yield from self._collect(pending.popleft())
+            if chunk:
+                pending.append(self._submit(pool, chunk))
+            while pending:
+                yield from self._collect(pending.popleft())
+        self._elapsed += time.perf_counter() - start
+
+    def _submit(self, pool, chunk):
+        keys = [None] * len(chunk)
+        results = [None] * len(chunk)
+        if self.cache is not None:
+            for i, (tag, text) in enumerate(chunk):
+                keys[i] = self.cache.key(text)
+                results[i] = self.cache.get(keys[i])
+
+        misses = [i for i, result in enumerate(results) if result is None]
+        future = pool.submit(_classify_chunk, self.classify, [chunk[i][1] for i in misses]) if misses else None
+        return chunk, keys, results, misses, future
+
+    def _collect(self, submitted):
+        chunk, keys, results, misses, future = submitted
+        if future is not None:
+            pid, busy, computed = future.result()
+            worker = self._worker_stats.setdefault(pid, {'messages': 0, 'busy_seconds': 0.0})
+            worker['messages'] += len(computed)
+            worker['busy_seconds'] += busy
+            for i, result in zip(misses, computed):
+                results[i] = result
+                if self.cache is not None:
+                    self.cache.put(keys[i], result)
+
+        self._messages += len(chunk)
+        for (tag, _), result in zip(chunk, results):
+            yield tag, result
+
+    def stats(self):
+        """Overall and per-worker throughput (messages/sec)"""
+        workers = {}
+        for pid, worker in self._worker_stats.items():
+            busy = worker['busy_seconds']
+            workers[pid] = {
+                'messages': worker['messages'],
+                'busy_seconds': busy,
+                'messages_per_sec': worker['messages'] / busy if busy else 0.0
+            }
+        return {
+            'messages': self._messages,
+            'elapsed_seconds': self._elapsed,
+            'messages_per_sec': self._messages / self._elapsed if self._elapsed else 0.0,
+            'workers': workers
+        }
@@ -0,0 +1,353 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .motion import GATE_SIZE, MotionGate
+from .video_frames import (DEFAULT_SAMPLE_FPS, FALLBACK_FPS, RingBuffer, VideoDecodeError, open_video, prepare_frame,
+                           video_info)
+from .violence import DETECTION_THRESHOLD
+from .violence_model import DEFAULT_HOP, get_violence_model
+
+# Lowest frames per second a stream is degraded to under load
+MIN_SAMPLE_FPS = 1.0
+# Sampled frames older than this (seconds behind live) are dropped instead of analyzed
+MAX_LAG_SECONDS = 2.0
+# Frames a stream sends to the inference pool per turn
+SLICE_FRAMES = 8
+# Frames (decoded or only grabbed) one read of a stream may go through before handing the decode thread back
+MAX_GRABS = 256
+# Frames per second a caught-up stream gains back per turn
+FPS_RECOVERY = 0.25
+# Seconds between status reports
+REPORT_SECONDS = 5.0
+# Idle wait bounds while a stream has no frame due (seconds)
+MIN_WAIT = 0.005
+MAX_WAIT = 0.25
+
+
+class StreamSource:
+    """
+    A video file played at its own frame rate as if it were a live camera:
+    a frame can only be read once its timestamp has passed on the wall
+    clock. loop restarts the file at the end, which stands in for a camera
+    that never stops.
+    """
+
+    def __init__(self, path, name=None, loop=False):
+        self.path = path
+        self.name = name or os.path.basename(path)
+        self.loop = loop
+
+
+class _Stream:
+    """Reader and inference state of one source, plus its counters"""
+
+    def __init__(self, source, sample_fps, min_fps, size, hop):
+        self.source = source
+        self.target_fps = sample_fps
+        self.min_fps = min_fps
+        self.sample_fps = sample_fps
+        self.size = size
+        self.hop = hop
+        self.capture = None
+        self.fps = FALLBACK_FPS
+        self.duration = 0.0
+        self.position = 0
+        self.offset = 0.0
+        self.next_sample = 0.0
+        self.finished = False
+        self.gate = MotionGate()
+        self.ring = None
+        self.since_window = 0
+        self.slowed_at = None
+        self.stats = {'frames_processed': 0, 'frames_dropped': 0, 'slices': 0, 'busy_seconds': 0.0,
+                      'windows_scored': 0, 'violent_windows': 0, 'peak_probability': 0.0, 'lag_seconds': 0.0,
+                      'max_lag_seconds': 0.0, 'loops': 0}
+
+    def open(self):
+        self.capture = open_video(self.source.path)
+        info = video_info(self.capture)
+        self.fps = info.fps or FALLBACK_FPS
+        self.duration = info.duration
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def _rewind(self):
+        """End of file: start over (loop) or finish. False when finished."""
+        if not self.source.loop or self.position == 0:
+            self.finished = True
+            return False
+        self.capture.release()
+        self.capture = open_video(self.source.path)
+        self.offset += self.position / self.fps
+        self.position = 0
+        self.next_sample = 0.0
+        self.stats['loops'] += 1
+        return True
+
+    def next_due(self):
+        """Stream clock time the next sampled frame becomes available"""
+        return self.offset + self.next_sample
+
+    def read_due(self, now, max_lag, limit, max_grabs=MAX_GRABS):
+        """
+        Read the sampled frames whose time has come (up to limit) as
+        ([(timestamp, RGB image)], newest). Sampled frames more than max_lag
+        behind now are only grabbed and counted as dropped; unsampled ones
+        are only grabbed. At most max_grabs frames are gone through per
+        call, so a stream far behind does not hold the decode thread.
+        newest is the stream clock time of the last frame gone through, read
+        or not (None when no frame was due): how far behind the stream is.
+        Runs on a decode thread.
+        """
+
+        frames = []
+        newest = None
+        grabs = 0
+        while len(frames) < limit and grabs < max_grabs and self.offset + self.position / self.fps <= now:
+            timestamp = self.position / self.fps
+            sampled = timestamp + 1e-6 >= self.next_sample
+            if sampled:
+                # Keep the sampling phase unless the stream fell more than one sample behind it
+                step = 1 / self.sample_fps
+                self.next_sample = self.next_sample + step if self.next_sample + step > timestamp else timestamp + step
+            if sampled and now - (self.offset + timestamp) <= max_lag:
+                ok, image = self.capture.read()
+                if ok:
+                    frames.append((self.offset + timestamp, prepare_frame(image, self.size)))
+            else:
+                ok = self.capture.grab()
+                if ok and sampled:
+                    self.stats['frames_dropped'] += 1
+            if not ok:
+                if not self._rewind():
+                    break
+                continue
+            newest = self.offset + timestamp
+            grabs += 1
+            self.position += 1
+        return frames, newest
+
+    def infer(self, model, frames, threshold):
+        """
+        Motion for every frame and, with a model, its embedding into this
+        stream's ring and a score for each window completed every hop
+        frames. Runs on the shared inference pool.
+        """
+
+        images = np.stack([image for _, image in frames])
+        for image in images:
+            self.gate.measure(image)
+        if model is not None:
+            if self.ring is None:
+                self.ring = RingBuffer(model.window, (model.embedding_dim,), np.float32)
+            pending = []
+            for embedding, (timestamp, _) in zip(model.embed(images), frames):
+                self.ring.push(embedding, timestamp)
+                self.since_window += 1
+                if self.ring.full and self.since_window >= self.hop:
+                    pending.append(self.ring.window()[0])
+                    self.since_window = 0
+            if pending:
+                probs = model.score(pending)
+                self.stats['windows_scored'] += len(probs)
+                self.stats['violent_windows'] += int(np.count_nonzero(probs >= threshold))
+                self.stats['peak_probability'] = max(self.stats['peak_probability'], float(probs.max()))
+        self.stats['frames_processed'] += len(frames)
+
+    def adapt(self, now, lag, max_lag):
+        """
+        Halve the sample rate while the stream falls behind, at most once per
+        max_lag seconds so a cut shows in the lag before the next one; win it
+        back slowly once the stream has caught up
+        """
+        self.stats['lag_seconds'] = lag
+        self.stats['max_lag_seconds'] = max(self.stats['max_lag_seconds'], lag)
+        if lag > max_lag / 2:
+            if self.slowed_at is None or now - self.slowed_at >= max_lag:
+                self.sample_fps = max(self.min_fps, self.sample_fps / 2)
+                self.slowed_at = now
+        elif lag < max_lag / 4 and self.sample_fps < self.target_fps:
+            self.sample_fps = min(self.target_fps, self.sample_fps + FPS_RECOVERY)
+
+    def describe(self):
+        stats = self.stats
+        seen = stats['frames_processed'] + stats['frames_dropped']
+        return {
+            'name': self.source.name,
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()},
+            'drop_ratio': round(stats['frames_dropped'] / seen, 3) if seen else 0.0,
+            'sample_fps': round(self.sample_fps, 2),
+            'motion_intensity': self.gate.motion_intensity(),
+            'finished': self.finished
+        }
+
+
+class StreamScheduler:
+    """
+    Real-time ingest of several video sources on one box.
+
+    Each source has its own asyncio task that reads its due frames on a
+    decode thread and, SLICE_FRAMES at a time, takes a turn on the shared
+    inference pool (the violence model when one is configured, motion
+    measurement always). Turns are handed out in arrival order
+    (asyncio.Semaphore is FIFO), so every stream gets its slice before any
+    stream gets a second one.
+
+    A stream that falls behind live first has its sample rate halved (down
+    to min_fps), and frames still more than max_lag seconds late are
+    dropped rather than queued, so lag stays bounded whatever the load.
+    stats() reports lag, dropped frames and the current sample rate per
+    stream.
+    """
+
+    def __init__(self, sources, model=None, sample_fps=DEFAULT_SAMPLE_FPS, min_fps=MIN_SAMPLE_FPS, workers=None,
+                 slice_frames=SLICE_FRAMES, max_lag=MAX_LAG_SECONDS, threshold=DETECTION_THRESHOLD, hop=DEFAULT_HOP,
+                 max_grabs=MAX_GRABS):
+        self.model = model
+        self.workers = workers or max(1, min(4, os.cpu_count() or 1))
+        self.slice_frames = slice_frames
+        self.max_grabs = max_grabs
+        self.max_lag = max_lag
+        self.threshold = threshold
+        size = model.frame_size if model is not None else GATE_SIZE
+        self.streams = [_Stream(source, sample_fps, min(min_fps, sample_fps), size, hop) for source in sources]
+        self._started = None
+        self._finished = None
+
+    def _now(self):
+        return time.monotonic() - self._started
+
+    async def _ingest(self, stream, decoder, pool, turns, deadline):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(decoder, stream.open)
+        try:
+            while not stream.finished and (deadline is None or self._now() < deadline):
+                frames, newest = await loop.run_in_executor(decoder, stream.read_due, self._now(), self.max_lag,
+                                                            self.slice_frames, self.max_grabs)
+                if frames:
+                    async with turns:
+                        # Frames that went stale waiting for this turn are dropped too
+                        fresh = [frame for frame in frames if self._now() - frame[0] <= self.max_lag]
+                        stream.stats['frames_dropped'] += len(frames) - len(fresh)
+                        if fresh:
+                            start = time.perf_counter()
+                            await loop.run_in_executor(pool, stream.infer, self.model, fresh, self.threshold)
+                            stream.stats['busy_seconds'] += time.perf_counter() - start
+                            stream.stats['slices'] += 1
+                if newest is not None:
+                    # Every pass that went through frames adapts, also one whose frames were all dropped
+                    now = self._now()
+                    stream.adapt(now, now - newest, self.max_lag)
+                elif not stream.finished:
+                    await asyncio.sleep(min(MAX_WAIT, max(MIN_WAIT, stream.next_due() - self._now())))
+        finally:
+            stream.close()
+
+    async def _report(self, on_report, every):
+        while True:
+            await asyncio.sleep(every)
+            on_report(self.stats())
+
+    async def run(self, duration=None, on_report=None, report_every=REPORT_SECONDS):
+        """
+        Ingest every source until it ends (or for duration seconds, which
+        looping sources need); on_report(stats) is called every report_every
+        seconds. Returns the final stats().
+        """
+
+        self._started = time.monotonic()
+        decoder = ThreadPoolExecutor(max_workers=min(32, len(self.streams)), thread_name_prefix='sia-stream-decode')
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sia-stream-infer')
+        turns = asyncio.Semaphore(self.workers)
+        reporter = asyncio.create_task(self._report(on_report, report_every)) if on_report else None
+        try:
+            results = await asyncio.gather(*(self._ingest(stream, decoder, pool, turns, duration)
+                                             for stream in self.streams), return_exceptions=True)
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            pool.shutdown(wait=True)
+            decoder.shutdown(wait=True)
+            self._finished = time.monotonic()
+        for stream, error in zip(self.streams, results):
+            if isinstance(error, VideoDecodeError):
+                stream.finished = True
+                stream.stats['error'] = str(error)
+            elif isinstance(error, BaseException):
+                raise error
+        return self.stats()
+
+    def stats(self):
+        if self._started is None:
+            return {}
+        elapsed = (self._finished or time.monotonic()) - self._started
+        streams = [stream.describe() for stream in self.streams]
+        busy = sum(stream['busy_seconds'] for stream in streams)
+        return {
+            'elapsed_seconds': round(elapsed, 2),
+            'workers': self.workers,
+            'pool_occupancy': round(busy / (elapsed * self.workers), 3) if elapsed else 0.0,
+            'max_lag_seconds': max((stream['lag_seconds'] for stream in streams), default=0.0),
+            'frames_dropped': sum(stream['frames_dropped'] for stream in streams),
+            'streams': streams
+        }
+
+
+def add_arguments(parser):
+    parser.add_argument('sources', nargs='+', help="Video files, each ingested as one live stream")
+    parser.add_argument('--loop', action='store_true', help="Restart each file at its end, like a camera")
+    parser.add_argument('--duration', type=float, help="Seconds to run (required with --loop)")
+    parser.add_argument('--sample-fps', type=float, default=DEFAULT_SAMPLE_FPS,
+                        help="Frames per second analyzed per stream when the box keeps up")
+    parser.add_argument('--min-fps', type=float, default=MIN_SAMPLE_FPS,
+                        help="Lowest frames per second a stream is degraded to under load")
+    parser.add_argument('--workers', type=int, help="Inference threads shared by all streams")
+    parser.add_argument('--max-lag', type=float, default=MAX_LAG_SECONDS,
+                        help="Seconds behind live after which frames are dropped")
+    parser.add_argument('--threshold', type=float, default=DETECTION_THRESHOLD,
+                        help="Window probability that counts as violence")
+    parser.add_argument('--report-every', type=float, default=REPORT_SECONDS, help="Seconds between status lines")
+    parser.add_argument('--json', action='store_true', help="Print the final stats as JSON")
+
+
+def _print_report(stats):
+    print(f"[{stats['elapsed_seconds']:7.1f}s] pool {stats['pool_occupancy']:.0%} busy, "
+          f"{stats['frames_dropped']} frames dropped")
+    for stream in stats['streams']:
+        print(f"  {stream['name']:<24} lag {stream['lag_seconds']:5.2f}s (max {stream['max_lag_seconds']:5.2f}s)  "
+              f"{stream['sample_fps']:4.1f} fps  processed {stream['frames_processed']:6d}  "
+              f"dropped {stream['frames_dropped']:5d}  violent windows {stream['violent_windows']}")
+
+
+def run(args):
+    if args.loop and args.duration is None:
+        raise SystemExit("--loop needs --duration")
+    sources = [StreamSource(path, name=f"{index}:{os.path.basename(path)}", loop=args.loop)
+               for index, path in enumerate(args.sources)]
+    scheduler = StreamScheduler(sources, get_violence_model(), sample_fps=args.sample_fps, min_fps=args.min_fps,
+                                workers=args.workers, max_lag=args.max_lag, threshold=args.threshold)
+    stats = asyncio.run(scheduler.run(args.duration, on_report=None if args.json else _print_report,
+                                      report_every=args.report_every))
+    if args.json:
+        print(json.dumps(stats))
+    else:
+        _print_report(stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest several video streams in real time on one box")
+    add_arguments(parser)
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
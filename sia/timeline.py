@@ -0,0 +1,200 @@
+from collections import deque
+
+import numpy as np
+
+SMOOTHING_METHODS = ('median', 'ema', 'none')
+DEFAULT_SMOOTHING = 'median'
+# Weight of the newest score in the exponential moving average
+EMA_ALPHA = 0.3
+# Windows in the centered running median (odd)
+MEDIAN_WINDOWS = 5
+# A violent interval closes only when the score falls this far below the threshold
+HYSTERESIS = 0.1
+# EMA terms smaller than this are dropped from the kernel
+EMA_TOLERANCE = 1e-9
+# Windows in a row above the threshold that raise an alert
+DEFAULT_ALERT_WINDOWS = 3
+
+
+def score_timeline(windows, step, duration=0.0):
+    """
+    (times, scores) on a regular grid of step seconds covering the video.
+    Each slot holds the highest probability of the windows starting in it
+    (from its time up to the next slot's);
+    slots no window started in (static footage skipped by the motion gate)
+    are 0.
+    """
+
+    starts = np.array([window['start'] for window in windows], dtype=np.float64)
+    probs = np.array([window['probability'] for window in windows], dtype=np.float64)
+    last = max(duration, float(starts.max()) if len(starts) else 0.0)
+    scores = np.zeros(int(last // step) + 1)
+    # Floor, not round: a gated segment can start half a slot off the grid, and rounding would then
+    # put two consecutive windows in one slot and leave the next empty
+    slots = np.floor(starts / step + 1e-6).astype(np.int64)
+    np.maximum.at(scores, np.minimum(slots, len(scores) - 1), probs)
+    return np.arange(len(scores)) * step, scores
+
+
+def ema(scores, alpha=EMA_ALPHA):
+    """
+    Exponential moving average (first value as the seed) as one truncated
+    convolution instead of a Python loop over the scores
+    """
+
+    n = len(scores)
+    if not n or alpha >= 1:
+        return np.array(scores, dtype=np.float64)
+    terms = min(n, int(np.ceil(np.log(EMA_TOLERANCE) / np.log(1 - alpha))))
+    kernel = alpha * (1 - alpha) ** np.arange(terms)
+    return np.convolve(scores, kernel)[:n] + (1 - alpha) ** np.arange(1, n + 1) * scores[0]
+
+
+def running_median(scores, size=MEDIAN_WINDOWS):
+    """Centered running median; the edges repeat the first / last score"""
+    if len(scores) < 2 or size < 2:
+        return np.array(scores, dtype=np.float64)
+    padded = np.pad(scores, (size // 2, size - 1 - size // 2), mode='edge')
+    return np.median(np.lib.stride_tricks.sliding_window_view(padded, size), axis=1)
+
+
+def smooth_scores(scores, method=DEFAULT_SMOOTHING):
+    if method == 'median':
+        return running_median(scores)
+    if method == 'ema':
+        return ema(scores)
+    if method in (None, 'none'):
+        return np.array(scores, dtype=np.float64)
+    raise ValueError(f"smoothing must be one of {', '.join(SMOOTHING_METHODS)}")
+
+
+def hysteresis_mask(scores, high, low):
+    """
+    True from a score at or above high until a score below low: each slot
+    takes the state of the last slot that crossed either bound
+    """
+
+    state = np.full(len(scores), -1, dtype=np.int8)
+    state[scores >= high] = 1
+    state[scores < low] = 0
+    positions = np.where(state >= 0, np.arange(len(scores)), -1)
+    last = np.maximum.accumulate(positions) if len(scores) else positions
+    return (last >= 0) & (state[np.maximum(last, 0)] == 1)
+
+
+def violent_intervals(times, scores, threshold, span, hysteresis=HYSTERESIS, duration=None):
+    """
+    [{'start', 'end', 'peak'}] for each run of slots flagged violent. A
+    window covers span seconds from its start, so a run ends span after its
+    last slot and runs whose covered time overlaps are merged.
+    """
+
+    mask = hysteresis_mask(scores, threshold, threshold - hysteresis) if hysteresis else scores >= threshold
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    first, stop = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if not len(first):
+        return []
+
+    starts = times[first]
+    ends = times[stop - 1] + span
+    if duration:
+        ends = np.minimum(ends, max(duration, float(times[-1])))
+    peaks = np.maximum.reduceat(np.append(scores, 0.0), np.ravel(np.column_stack([first, stop])))[::2]
+
+    # A run starting before every earlier run has ended continues the same interval
+    opens = np.ones(len(starts), dtype=bool)
+    opens[1:] = starts[1:] > np.maximum.accumulate(ends)[:-1]
+    group = np.cumsum(opens) - 1
+    merged_ends = np.zeros(group[-1] + 1)
+    merged_peaks = np.zeros(group[-1] + 1)
+    np.maximum.at(merged_ends, group, ends)
+    np.maximum.at(merged_peaks, group, peaks)
+    return [{'start': round(float(start), 2), 'end': round(float(end), 2), 'peak': round(float(peak), 4)}
+            for start, end, peak in zip(starts[opens], merged_ends, merged_peaks)]
+
+
+def violence_timeline(windows, threshold, smoothing=DEFAULT_SMOOTHING, step=None, duration=0.0):
+    """
+    Score timeline and violent intervals of a video from its scored windows
+    (ViolenceModel.scan output). step defaults to the spacing of
+    consecutive windows; the threshold applies to the smoothed scores.
+    """
+
+    if not windows:
+        return {'step_seconds': step or 0.0, 'smoothing': smoothing, 'times': [], 'scores': [], 'smoothed': [],
+                'intervals': []}
+    starts = np.array([window['start'] for window in windows])
+    spans = np.array([window['end'] - window['start'] for window in windows])
+    if step is None:
+        gaps = np.diff(starts)
+        gaps = gaps[gaps > 0]
+        step = float(gaps.min()) if len(gaps) else max(float(spans.max()), 1.0)
+
+    times, scores = score_timeline(windows, step, duration)
+    smoothed = smooth_scores(scores, smoothing)
+    hysteresis = HYSTERESIS if smoothing not in (None, 'none') else 0.0
+    intervals = violent_intervals(times, smoothed, threshold, float(np.median(spans)), hysteresis, duration)
+    return {
+        'step_seconds': round(step, 4),
+        'smoothing': smoothing,
+        'times': np.round(times, 3).tolist(),
+        'scores': np.round(scores, 4).tolist(),
+        'smoothed': np.round(smoothed, 4).tolist(),
+        'intervals': intervals
+    }
+
+
+class AlertTrigger:
+    """
+    Online counterpart of violence_timeline for alerting: fed one scored
+    window at a time, it smooths causally (trailing median, running EMA or
+    raw) and fires once the smoothed score has stayed at or above threshold
+    for consecutive windows in a row. A gap in the windows (footage the
+    motion gate skipped) restarts the count and the smoothing. hit is the
+    first window of the run that fired.
+    """
+
+    def __init__(self, threshold, consecutive=DEFAULT_ALERT_WINDOWS, smoothing=DEFAULT_SMOOTHING, step=None):
+        if smoothing not in SMOOTHING_METHODS and smoothing is not None:
+            raise ValueError(f"smoothing must be one of {', '.join(SMOOTHING_METHODS)}")
+        self.threshold = threshold
+        self.consecutive = max(1, int(consecutive))
+        self.smoothing = smoothing
+        self.step = step
+        self.windows_seen = 0
+        self.hit = None
+        self._recent = deque(maxlen=MEDIAN_WINDOWS)
+        self._average = None
+        self._run = []
+        self._last_start = None
+
+    def _smooth(self, probability):
+        if self.smoothing == 'median':
+            self._recent.append(probability)
+            return float(np.median(self._recent))
+        if self.smoothing == 'ema':
+            self._average = probability if self._average is None else (
+                EMA_ALPHA * probability + (1 - EMA_ALPHA) * self._average)
+            return self._average
+        return probability
+
+    def update(self, window):
+        """Feed the next window ({'start', 'end', 'probability'}); True once the alert fires"""
+        if self.hit is not None:
+            return True
+        self.windows_seen += 1
+        if self._last_start is not None and self.step and window['start'] - self._last_start > 1.5 * self.step:
+            self._recent.clear()
+            self._average = None
+            self._run.clear()
+        self._last_start = window['start']
+
+        score = self._smooth(window['probability'])
+        if score < self.threshold:
+            self._run.clear()
+            return False
+        self._run.append({**window, 'smoothed': round(score, 4)})
+        if len(self._run) >= self.consecutive:
+            self.hit = self._run[0]
+            return True
+        return False
@@ -0,0 +1,205 @@
+import ipaddress
+import os
+import re
+import threading
+
+# Literals found with str.find; URL_PATTERN is only tried around them
+SCHEME_SEPARATORS = ('://', '[:]//')
+WWW_PREFIXES = ('www.', 'www[.]', 'WWW.', 'WWW[.]')
+# Dotted / bracketed IPv6 hosts first, then hostnames that may be defanged ("evil[.]com")
+URL_PATTERN = re.compile(
+    r'(?:(hxxps?|https?|fxp|ftp)(?:://|\[:\]//)|(?=www(?:\.|\[\.\])))'
+    r'(?:([^\s/?#@<>"\']*)@)?'
+    r'(\[[0-9a-f.]*:[0-9a-f:.]*\]|(?:[^\s/?#:@<>"\'()\[\],;!|\\]|\[\.\]|\(\.\)|\[dot\])+)'
+    r'(?::\d{1,5})?'
+    r'([/?#][^\s<>"\']*)?',
+    re.IGNORECASE
+)
+EMAIL_DOMAIN_PATTERN = re.compile(r'@((?:[a-z0-9-]+\.)+[a-z0-9-]+)', re.IGNORECASE)
+DEFANGED = re.compile(r'\[\.\]|\(\.\)|\[dot\]', re.IGNORECASE)
+
+# Used when no public_suffix_list.dat is configured (SIA_PUBLIC_SUFFIX_LIST)
+BUILTIN_SUFFIXES = """
+com net org edu gov mil int info biz name pro mobi io co ai app dev me tv cc us uk de fr nl be ch at
+es it pt pl ru ua cn jp kr in au nz ca br mx ar za ie se no dk fi cz hu ro gr tr il sg hk tw
+tk xyz top ml ga cf gq click link online site shop store club live buzz icu work loan win
+co.uk org.uk ac.uk gov.uk ltd.uk plc.uk me.uk net.uk
+com.au net.au org.au edu.au gov.au co.nz org.nz co.jp ne.jp or.jp ac.jp co.kr co.in
+com.br com.cn net.cn org.cn com.hk com.sg com.tw com.mx com.ar co.za com.tr
+github.io blogspot.com herokuapp.com appspot.com azurewebsites.net cloudfront.net
+""".split()
+
+
+class ExtractedUrl:
+    """One URL found in an email, with its host normalized for lookups"""
+
+    def __init__(self, url, scheme, host, obfuscated=False, userinfo=False):
+        self.url = url
+        self.scheme = scheme
+        self.host = host
+        self.obfuscated = obfuscated
+        self.userinfo = userinfo
+        self.ip_version = _ip_version(host)
+
+    @property
+    def is_ip(self):
+        return self.ip_version is not None
+
+    @property
+    def punycode(self):
+        return any(label.startswith('xn--') for label in self.host.split('.'))
+
+    def __repr__(self):
+        return f"ExtractedUrl({self.url!r}, host={self.host!r})"
+
+
+def _ip_version(host):
+    try:
+        address = ipaddress.ip_address(host.strip('[]'))
+    except ValueError:
+        # http://3232235876/ is a dotless IPv4 address
+        if host.isdigit() and int(host) < 2 ** 32:
+            return 4
+        return None
+    return address.version
+
+
+def normalize_host(host):
+    """Lowercase, undo defanging, drop trailing dots and convert unicode labels to punycode"""
+    host = DEFANGED.sub('.', host).strip('.').lower()
+    if not host.isascii():
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            pass
+    return host
+
+
+def _find_all(text, literal):
+    position = text.find(literal)
+    while position != -1:
+        yield position
+        position = text.find(literal, position + 1)
+
+
+def _url_starts(text):
+    """Sorted candidate start positions: up to 5 chars before a scheme separator, or a www. prefix"""
+    starts = set()
+    for separator in SCHEME_SEPARATORS:
+        for position in _find_all(text, separator):
+            starts.add((position, True))
+    for prefix in WWW_PREFIXES:
+        for position in _find_all(text, prefix):
+            starts.add((position, False))
+    return sorted(starts)
+
+
+def extract_urls(text):
+    """Every http(s)/ftp/www URL in text, including defanged hxxp:// and [.] forms"""
+
+    urls = []
+    end = 0
+    for position, after_scheme in _url_starts(text):
+        if position < end:
+            continue
+        match = None
+        if after_scheme:
+            # The scheme must end exactly at the separator
+            for start in range(max(position - 5, end), position):
+                match = URL_PATTERN.match(text, start)
+                if match and match.end(1) == position:
+                    break
+                match = None
+        else:
+            match = URL_PATTERN.match(text, position)
+        if match is None:
+            continue
+        end = match.end()
+
+        scheme, userinfo, raw_host, _ = match.groups()
+        scheme = (scheme or 'http').lower()
+        host = normalize_host(raw_host)
+        if not host:
+            continue
+        obfuscated = scheme.startswith(('hxxp', 'fxp')) or DEFANGED.search(raw_host) is not None
+        scheme = scheme.replace('xx', 'tt').replace('fxp', 'ftp')
+        url = match.group(0).rstrip('.,;:!?)')
+        urls.append(ExtractedUrl(url, scheme, host, obfuscated, userinfo=userinfo is not None))
+    return urls
+
+
+def extract_email_domains(text):
+    """Domains of the email addresses in text (senders, reply-to, smtp.mailfrom...)"""
+    return {normalize_host(match.group(1)) for match in EMAIL_DOMAIN_PATTERN.finditer(text)
+            if match.start() and (text[match.start() - 1].isalnum() or text[match.start() - 1] in '._+-')}
+
+
+class PublicSuffixList:
+    """
+    Trie of public suffix rules keyed by reversed labels, in the format of
+    publicsuffix.org's list (plain, "*." wildcard and "!" exception rules).
+    Finds the registrable domain (eTLD+1) of a host in one walk.
+    """
+
+    def __init__(self, rules):
+        self._root = {}
+        for rule in rules:
+            exception = rule.startswith('!')
+            node = self._root
+            for label in reversed(rule.lstrip('!').split('.')):
+                node = node.setdefault(label, {})
+            node['!' if exception else '$'] = True
+
+    @classmethod
+    def from_file(cls, path):
+        rules = []
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                line = line.strip()
+                if line and not line.startswith('//'):
+                    rule = line.split()[0]
+                    rules.append(('!' if rule.startswith('!') else '') + normalize_host(rule.lstrip('!')))
+        return cls(rules)
+
+    def suffix_length(self, labels):
+        """Number of trailing labels that form the public suffix (the implicit "*" rule gives 1)"""
+        matched = 1
+        node = self._root
+        for depth, label in enumerate(reversed(labels), start=1):
+            child = node.get(label)
+            if child is None:
+                child = node.get('*')
+                if child is None:
+                    break
+            if child.get('!'):
+                return depth - 1
+            if child.get('$'):
+                matched = depth
+            node = child
+        return matched
+
+    def public_suffix(self, host):
+        labels = host.split('.')
+        return '.'.join(labels[-self.suffix_length(labels):])
+
+    def registered_domain(self, host):
+        """eTLD+1 of host, or None when host is itself a public suffix"""
+        labels = host.split('.')
+        length = self.suffix_length(labels)
+        if len(labels) <= length:
+            return None
+        return '.'.join(labels[-(length + 1):])
+
+
+_suffixes = None
+_suffixes_lock = threading.Lock()
+
+
+def get_public_suffixes():
+    """Process-wide PublicSuffixList from SIA_PUBLIC_SUFFIX_LIST, or the built-in subset"""
+    global _suffixes
+    with _suffixes_lock:
+        if _suffixes is None:
+            path = os.environ.get('SIA_PUBLIC_SUFFIX_LIST')
+            _suffixes = PublicSuffixList.from_file(path) if path else PublicSuffixList(BUILTIN_SUFFIXES)
+        return _suffixes
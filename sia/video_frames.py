@@ -0,0 +1,203 @@
+import contextlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# MobileNetV2 input resolution (width, height)
+DEFAULT_FRAME_SIZE = (224, 224)
+# Frames per second of video actually analyzed
+DEFAULT_SAMPLE_FPS = 5
+# Used when the container does not report a frame rate
+FALLBACK_FPS = 30.0
+SPOOL_CHUNK_BYTES = 1 << 20
+
+
+class VideoDecodeError(ValueError):
+    """The file could not be opened or decoded as a video"""
+
+
+class VideoInfo:
+    """Container properties of a video as reported by OpenCV"""
+
+    def __init__(self, fps, frame_count, width, height):
+        self.fps = fps
+        self.frame_count = frame_count
+        self.width = width
+        self.height = height
+
+    @property
+    def duration(self):
+        return self.frame_count / self.fps if self.fps else 0.0
+
+    def describe(self):
+        return {'fps': round(self.fps, 2), 'frame_count': self.frame_count, 'width': self.width,
+                'height': self.height, 'duration_seconds': round(self.duration, 2)}
+
+
+class Frame:
+    """
+    One sampled frame: source frame index, timestamp in seconds and RGB image,
+    plus pixels, the image already normalized for the model when a
+    preprocessing stage did it. embedding and motion are filled in once
+    computed (or come from the embedding cache, with no image).
+    """
+
+    def __init__(self, index, timestamp, image, pixels=None, embedding=None, motion=None):
+        self.index = index
+        self.timestamp = timestamp
+        self.image = image
+        self.pixels = pixels
+        self.embedding = embedding
+        self.motion = motion
+
+
+@contextlib.contextmanager
+def spool_upload(upload, suffix=None):
+    """
+    Copy an uploaded file object (Streamlit UploadedFile, open file...) to a
+    temporary file in 1 MB chunks and yield its path; the file is removed on
+    exit. OpenCV can only decode from a path.
+    """
+
+    if suffix is None:
+        suffix = os.path.splitext(getattr(upload, 'name', '') or '')[1] or '.mp4'
+    handle, path = tempfile.mkstemp(prefix='sia_video_', suffix=suffix)
+    try:
+        with os.fdopen(handle, 'wb') as fh:
+            if hasattr(upload, 'seek'):
+                upload.seek(0)
+            shutil.copyfileobj(upload, fh, SPOOL_CHUNK_BYTES)
+        yield path
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+
+def open_video(path):
+    """An opened cv2.VideoCapture of path; VideoDecodeError when OpenCV cannot open it"""
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        capture.release()
+        raise VideoDecodeError(f"cannot open {os.path.basename(path)} as a video")
+    return capture
+
+
+def video_info(capture):
+    """VideoInfo of an opened cv2.VideoCapture, from its container properties"""
+    import cv2
+
+    return VideoInfo(fps=capture.get(cv2.CAP_PROP_FPS) or 0.0,
+                     frame_count=max(int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), 0),
+                     width=int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                     height=int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+
+def probe_video(path):
+    """VideoInfo of a video file without decoding any frame"""
+    capture = open_video(path)
+    try:
+        return video_info(capture)
+    finally:
+        capture.release()
+
+
+def sampling_stride(source_fps, sample_fps=None, stride=1):
+    """Source frames per sampled frame: from sample_fps when given, else stride"""
+    if sample_fps:
+        return max(1, round((source_fps or FALLBACK_FPS) / sample_fps))
+    return max(1, int(stride))
+
+
+def iter_raw_frames(path, sample_fps=DEFAULT_SAMPLE_FPS, stride=1, max_frames=None):
+    """
+    Decode half of iter_frames: (index, timestamp, BGR image at source
+    resolution) for every stride-th frame. Skipped frames are only grabbed.
+    """
+
+    capture = open_video(path)
+    try:
+        info = video_info(capture)
+        step = sampling_stride(info.fps, sample_fps, stride)
+        fps = info.fps or FALLBACK_FPS
+        index = 0
+        sampled = 0
+        while max_frames is None or sampled < max_frames:
+            if index % step:
+                if not capture.grab():
+                    break
+                index += 1
+                continue
+            ok, image = capture.read()
+            if not ok:
+                break
+            yield index, index / fps, image
+            sampled += 1
+            index += 1
+    finally:
+        capture.release()
+
+
+def prepare_frame(image, size=DEFAULT_FRAME_SIZE):
+    """Decoded BGR image -> RGB uint8 resized to size (width, height; None keeps it)"""
+
+    import cv2
+
+    if size is not None and (image.shape[1], image.shape[0]) != tuple(size):
+        image = cv2.resize(image, tuple(size), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def iter_frames(path, sample_fps=DEFAULT_SAMPLE_FPS, stride=1, size=DEFAULT_FRAME_SIZE, max_frames=None):
+    """
+    Yield every stride-th frame of a video (stride derived from sample_fps
+    when given) as a Frame with an RGB uint8 image resized to size
+    (width, height; None keeps the source resolution).
+
+    Frames are decoded one at a time: skipped frames are only grabbed, never
+    converted or resized, and nothing is retained between iterations, so
+    memory stays flat whatever the length of the video.
+    """
+
+    for index, timestamp, image in iter_raw_frames(path, sample_fps, stride, max_frames):
+        yield Frame(index, timestamp, prepare_frame(image, size))
+
+
+class RingBuffer:
+    """
+    The most recent capacity items (frames, embeddings...) of one shape in a
+    single preallocated array, with a timestamp each. push() overwrites the
+    oldest slot, so a long video never grows the buffer.
+    """
+
+    def __init__(self, capacity, item_shape, dtype=np.uint8):
+        self.capacity = capacity
+        self._items = np.empty((capacity,) + tuple(item_shape), dtype=dtype)
+        self._timestamps = np.zeros(capacity)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def full(self):
+        return self._count == self.capacity
+
+    def push(self, item, timestamp):
+        self._items[self._next] = item
+        self._timestamps[self._next] = timestamp
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def window(self):
+        """(items, timestamps) oldest first, as copies"""
+        order = (np.arange(self._count) + (self._next - self._count)) % self.capacity
+        return self._items[order], self._timestamps[order]
@@ -0,0 +1,161 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .video_frames import DEFAULT_FRAME_SIZE, DEFAULT_SAMPLE_FPS, Frame, iter_raw_frames, prepare_frame
+
+# Prepared frames buffered between preprocessing and inference
+DEFAULT_QUEUE_FRAMES = 64
+# Queue polling interval, so a stopped pipeline notices promptly
+POLL_SECONDS = 0.1
+
+_END = object()
+
+
+class VideoPipeline:
+    """
+    Decode, preprocess and inference as overlapping stages.
+
+    A decode thread reads the sampled frames and hands each to a pool of
+    preprocessing threads (resize, color conversion and the model's NumPy
+    normalization; OpenCV and NumPy release the GIL). At most 2 x workers
+    full-resolution frames exist at once. Their futures go, in order, into
+    a queue of queue_frames slots that the caller (the inference stage)
+    drains by iterating; a full queue blocks decoding, which is the
+    backpressure. stats() shows how busy each stage was and where it waited.
+
+    Iterating yields video_frames.Frame objects in frame order, so the
+    pipeline is a drop-in replacement for iter_frames. Leaving the loop early
+    stops the threads.
+    """
+
+    def __init__(self, path, sample_fps=DEFAULT_SAMPLE_FPS, size=DEFAULT_FRAME_SIZE, prepare=None, workers=None,
+                 queue_frames=DEFAULT_QUEUE_FRAMES):
+        self.path = path
+        self.sample_fps = sample_fps
+        self.size = size
+        self.prepare = prepare
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.queue_frames = queue_frames
+        self._queue = queue.Queue(maxsize=queue_frames)
+        self._raw_slots = threading.BoundedSemaphore(2 * self.workers)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._started = None
+        self._finished = None
+        self._stats = {
+            'decode': {'frames': 0, 'busy_seconds': 0.0, 'blocked_seconds': 0.0},
+            'preprocess': {'frames': 0, 'busy_seconds': 0.0, 'blocked_seconds': 0.0},
+            'inference': {'frames': 0, 'busy_seconds': 0.0, 'starved_seconds': 0.0}
+        }
+        self._depth_total = 0
+        self._depth_max = 0
+
+    def _preprocess(self, index, timestamp, raw):
+        start = time.perf_counter()
+        try:
+            image = prepare_frame(raw, self.size)
+            pixels = self.prepare(image) if self.prepare is not None else None
+        finally:
+            self._raw_slots.release()
+        with self._lock:
+            self._stats['preprocess']['frames'] += 1
+            self._stats['preprocess']['busy_seconds'] += time.perf_counter() - start
+        return Frame(index, timestamp, image, pixels)
+
+    def _put(self, item):
+        """Queue item unless the pipeline is stopped; returns the seconds spent blocked"""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        return time.perf_counter() - start
+
+    def _decode(self, pool):
+        stats = self._stats['decode']
+        frames = iter_raw_frames(self.path, sample_fps=self.sample_fps)
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                item = next(frames, None)
+                stats['busy_seconds'] += time.perf_counter() - start
+                if item is None:
+                    self._put(_END)
+                    return
+                stats['frames'] += 1
+
+                start = time.perf_counter()
+                while not self._raw_slots.acquire(timeout=POLL_SECONDS):
+                    if self._stop.is_set():
+                        return
+                self._stats['preprocess']['blocked_seconds'] += time.perf_counter() - start
+                stats['blocked_seconds'] += self._put(pool.submit(self._preprocess, *item))
+        except Exception as e:
+            self._put(e)
+        finally:
+            frames.close()
+
+    def __iter__(self):
+        stats = self._stats['inference']
+        self._started = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sia-video-preprocess')
+        decoder = threading.Thread(target=self._decode, args=(pool,), name='sia-video-decode', daemon=True)
+        decoder.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                depth = self._queue.qsize()
+                item = self._queue.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                frame = item.result()
+                stats['starved_seconds'] += time.perf_counter() - start
+                self._depth_total += depth
+                self._depth_max = max(self._depth_max, depth)
+
+                start = time.perf_counter()
+                yield frame
+                stats['busy_seconds'] += time.perf_counter() - start
+                stats['frames'] += 1
+        finally:
+            self._stop.set()
+            decoder.join()
+            pool.shutdown(wait=True, cancel_futures=True)
+            self._finished = time.perf_counter()
+
+    def stats(self):
+        """
+        Per stage: frames, busy_seconds, occupancy (busy share of the wall
+        time, per worker for preprocess) and the seconds it waited:
+        decode blocked on a full queue (inference is behind), preprocess
+        blocked on its raw-frame slots (the pool is behind), inference
+        starved on an empty queue (decode or preprocess is behind). The
+        bottleneck is the stage with the highest occupancy.
+        """
+
+        if self._started is None:
+            return {}
+        wall = (self._finished or time.perf_counter()) - self._started
+        stages = {name: {key: round(value, 3) if isinstance(value, float) else value
+                         for key, value in stage.items()}
+                  for name, stage in self._stats.items()}
+        for name, stage in stages.items():
+            capacity = wall * (self.workers if name == 'preprocess' else 1)
+            stage['occupancy'] = round(stage['busy_seconds'] / capacity, 3) if capacity else 0.0
+        stages['preprocess']['workers'] = self.workers
+        frames = stages['inference']['frames']
+        return {
+            'wall_seconds': round(wall, 3),
+            **stages,
+            'queue': {'capacity': self.queue_frames,
+                      'mean_depth': round(self._depth_total / frames, 1) if frames else 0.0,
+                      'max_depth': self._depth_max},
+            'bottleneck': max(('decode', 'preprocess', 'inference'), key=lambda name: stages[name]['occupancy'])
+        }
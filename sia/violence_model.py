@@ -0,0 +1,284 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .video_frames import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+# Saved Keras model: the trained TimeDistributed(MobileNetV2) + LSTM Sequential model, or an LSTM head
+# over per-frame embeddings, in which case SIA_VIOLENCE_EMBEDDER (default: ImageNet MobileNetV2) embeds
+MODEL_PATH_ENV = 'SIA_VIOLENCE_MODEL'
+EMBEDDER_PATH_ENV = 'SIA_VIOLENCE_EMBEDDER'
+# Pixel scaling the model was trained with: mobilenet_v2 ([-1, 1]), rescale ([0, 1]) or none
+PREPROCESS_ENV = 'SIA_VIOLENCE_PREPROCESS'
+# Backend for the per-frame CNN: keras (float32) or tflite, which runs the int8 / float16 file written by
+# `sia violence-tflite MODEL convert` (SIA_VIOLENCE_TFLITE) on SIA_VIOLENCE_THREADS interpreter threads
+BACKEND_ENV = 'SIA_VIOLENCE_BACKEND'
+TFLITE_PATH_ENV = 'SIA_VIOLENCE_TFLITE'
+THREADS_ENV = 'SIA_VIOLENCE_THREADS'
+
+DEFAULT_WINDOW = 16
+# Sampled frames between the starts of consecutive scored windows
+DEFAULT_HOP = 2
+EMBED_BATCH = 32
+
+
+def _split_model(model, embedder_path=None):
+    """
+    (embedder, head): embedder maps (n, h, w, 3) frames to (n, d) embeddings,
+    head maps (n, window, d) embedding windows to class probabilities. A
+    Sequential model whose leading layers are TimeDistributed is cut after
+    them, so the CNN half runs per frame and the rest per window.
+    """
+
+    import tensorflow as tf
+
+    leading = []
+    if isinstance(model, tf.keras.Sequential):
+        for layer in model.layers:
+            if not isinstance(layer, tf.keras.layers.TimeDistributed):
+                break
+            leading.append(layer)
+
+    if leading:
+        window = model.input_shape[1] or DEFAULT_WINDOW
+        frames = tf.keras.Input(model.input_shape[2:])
+        x = frames
+        for layer in leading:
+            x = layer.layer(x)
+        embedder = tf.keras.Model(frames, x)
+
+        embeddings = tf.keras.Input((window, embedder.output_shape[-1]))
+        x = embeddings
+        for layer in model.layers[len(leading):]:
+            x = layer(x)
+        return embedder, tf.keras.Model(embeddings, x)
+
+    if embedder_path:
+        embedder = tf.keras.models.load_model(embedder_path, compile=False)
+    else:
+        embedder = tf.keras.applications.MobileNetV2(include_top=False, pooling='avg', weights='imagenet',
+                                                     input_shape=(224, 224, 3))
+    return embedder, model
+
+
+class ViolenceModel:
+    """
+    MobileNetV2 + LSTM violence classifier run incrementally over a stream
+    of frames. Every sampled frame goes through the CNN exactly once (in
+    batches of embed_batch) and its embedding into a window-sized ring
+    buffer; each window the LSTM scores is read from that ring, so a new
+    window costs hop CNN passes instead of window. The violence probability
+    is the last output unit (sigmoid output, or [non-violence, violence]).
+
+    tflite_path: a quantized TFLite copy of the CNN
+    (violence_tflite.convert_embedder) to embed with instead of Keras,
+    on num_threads interpreter threads; the LSTM head stays in Keras.
+    """
+
+    def __init__(self, model_path, embedder_path=None, preprocess='mobilenet_v2', embed_batch=EMBED_BATCH,
+                 tflite_path=None, num_threads=None):
+        import tensorflow as tf
+
+        self.embedder, self.head = _split_model(tf.keras.models.load_model(model_path, compile=False),
+                                                embedder_path)
+        self.backend = 'keras'
+        if tflite_path:
+            from .violence_tflite import TFLiteEmbedder
+
+            self.embedder = TFLiteEmbedder(tflite_path, num_threads)
+            self.backend = f"tflite-{self.embedder.quantization}"
+        self.window = self.head.input_shape[1] or DEFAULT_WINDOW
+        self.embedding_dim = self.head.input_shape[-1]
+        height, width = self.embedder.input_shape[1:3]
+        self.frame_size = (width, height)
+        self.preprocess = preprocess
+        self.embed_batch = embed_batch
+        # Identifies the embeddings this model produces, for the embedding cache
+        self.cache_key = ':'.join([self.backend, preprocess] + [
+            f"{os.path.basename(path)}:{os.path.getsize(path)}:{os.stat(path).st_mtime_ns}"
+            for path in (model_path, embedder_path, tflite_path) if path])
+
+    def normalize(self, images):
+        """
+        RGB uint8 frame(s) scaled as the model was trained; arrays that are not
+        uint8 were normalized already (video_pipeline does it per frame).
+        """
+        images = np.asarray(images)
+        if images.dtype != np.uint8:
+            return images.astype(np.float32, copy=False)
+        images = images.astype(np.float32)
+        if self.preprocess == 'mobilenet_v2':
+            return images / 127.5 - 1.0
+        if self.preprocess == 'rescale':
+            return images / 255.0
+        return images
+
+    def embed(self, images):
+        """(n, d) float32 embeddings of (n, h, w, 3) RGB frames (uint8 or normalized) in one CNN pass"""
+        return np.asarray(self.embedder(self.normalize(images), training=False), dtype=np.float32)
+
+    def score(self, windows):
+        """Violence probability of each (window, d) embedding window, in one LSTM pass"""
+        probs = np.asarray(self.head(np.asarray(windows, dtype=np.float32), training=False))
+        return probs.reshape(len(windows), -1)[:, -1]
+
+    def scan(self, frames, hop=DEFAULT_HOP, gate=None, stop=None):
+        """
+        Score overlapping windows of frames (Frame objects at frame_size).
+        Returns (windows, stats): windows is a list of {'start', 'end',
+        'probability'} in time order. A segment shorter than one window is
+        scored once, padded with its last frame.
+
+        gate: a motion.MotionGate. Frames are then embedded only around
+        motion: a moving frame opens a segment that includes the window - 1
+        frames before it and runs until window - 1 frames after the last
+        moving frame, so every window touching motion is scored whole.
+        Static stretches in between never reach the CNN.
+
+        Frames that already carry an embedding (and motion) skip the CNN
+        (and the motion measurement); that is how cached embeddings are
+        replayed. The others get theirs filled in.
+
+        stop: called with each scored window in order; when it returns True
+        the scan ends there (stats['stopped']) without reading further frames.
+        """
+
+        ring = RingBuffer(self.window, (self.embedding_dim,), np.float32)
+        windows = []
+        stats = {'frames_seen': 0, 'frames_embedded': 0, 'frames_scored': 0, 'windows_scored': 0,
+                 'embed_seconds': 0.0, 'lstm_seconds': 0.0, 'gate_seconds': 0.0, 'stopped': False}
+        segment = {'frames': 0, 'windows': 0}
+        batch = []
+
+        def score(pending):
+            start = time.perf_counter()
+            probs = self.score([items for items, _ in pending])
+            stats['lstm_seconds'] += time.perf_counter() - start
+            for (_, times), p in zip(pending, probs):
+                stats['windows_scored'] += 1
+                segment['windows'] += 1
+                windows.append({'start': float(times[0]), 'end': float(times[-1]), 'probability': float(p)})
+                if stop is not None and stop(windows[-1]):
+                    stats['stopped'] = True
+                    return
+
+        def flush():
+            todo = [frame for frame in batch if frame.embedding is None]
+            if todo:
+                start = time.perf_counter()
+                embeddings = self.embed(np.stack([frame.image if frame.pixels is None else frame.pixels
+                                                  for frame in todo]))
+                stats['embed_seconds'] += time.perf_counter() - start
+                stats['frames_embedded'] += len(todo)
+                for frame, embedding in zip(todo, embeddings):
+                    frame.embedding = embedding
+            pending = []
+            for frame in batch:
+                ring.push(frame.embedding, frame.timestamp)
+                segment['frames'] += 1
+                if ring.full and (segment['frames'] - self.window) % hop == 0:
+                    pending.append(ring.window())
+            stats['frames_scored'] += len(batch)
+            batch.clear()
+            if pending:
+                score(pending)
+
+        def add(frame):
+            batch.append(frame)
+            if len(batch) >= self.embed_batch:
+                flush()
+
+        def end_segment():
+            if batch:
+                flush()
+            if not segment['windows'] and len(ring):
+                items, times = ring.window()
+                padding = self.window - len(items)
+                score([(np.concatenate([items, np.repeat(items[-1:], padding, axis=0)]),
+                        np.concatenate([times, np.repeat(times[-1:], padding)]))])
+            ring.clear()
+            segment.update(frames=0, windows=0)
+
+        preroll = deque(maxlen=self.window - 1)
+        postroll = 0
+        active = gate is None
+        for frame in frames:
+            stats['frames_seen'] += 1
+            if gate is not None:
+                start = time.perf_counter()
+                if frame.motion is None:
+                    frame.motion = gate.measure(frame.image)
+                else:
+                    gate.record(frame.motion)
+                moving = gate.is_moving(frame.motion)
+                stats['gate_seconds'] += time.perf_counter() - start
+                if moving:
+                    postroll = self.window - 1
+                    if not active:
+                        active = True
+                        for earlier in preroll:
+                            add(earlier)
+                        preroll.clear()
+                elif postroll:
+                    postroll -= 1
+                elif active:
+                    end_segment()
+                    active = False
+                if not active:
+                    preroll.append(frame)
+                    if stats['stopped']:
+                        break
+                    continue
+            add(frame)
+            if stats['stopped']:
+                break
+        if not stats['stopped']:
+            end_segment()
+        return windows, stats
+
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def get_violence_model():
+    """
+    The process-wide ViolenceModel, loaded on first use from SIA_VIOLENCE_MODEL
+    (and SIA_VIOLENCE_EMBEDDER; SIA_VIOLENCE_BACKEND=tflite embeds with
+    SIA_VIOLENCE_TFLITE). None when no model is configured or it fails to load.
+    """
+
+    global _model, _model_loaded
+    with _model_lock:
+        if not _model_loaded:
+            _model_loaded = True
+            model_path = os.environ.get(MODEL_PATH_ENV)
+            if model_path:
+                tflite = os.environ.get(BACKEND_ENV, 'keras') == 'tflite'
+                threads = os.environ.get(THREADS_ENV)
+                try:
+                    _model = ViolenceModel(model_path, os.environ.get(EMBEDDER_PATH_ENV),
+                                           preprocess=os.environ.get(PREPROCESS_ENV, 'mobilenet_v2'),
+                                           tflite_path=os.environ.get(TFLITE_PATH_ENV) if tflite else None,
+                                           num_threads=int(threads) if threads else None)
+                except Exception:
+                    logger.exception("Could not load the violence model from %s", model_path)
+        return _model
+
+
+def backend_name():
+    """
+    'mobilenet_v2+lstm' when a violence model is loaded (with its TFLite
+    quantization, e.g. 'mobilenet_v2+lstm (tflite-int8)'), 'heuristic' otherwise
+    """
+    model = get_violence_model()
+    if model is None:
+        return 'heuristic'
+    return 'mobilenet_v2+lstm' if model.backend == 'keras' else f"mobilenet_v2+lstm ({model.backend})"
@@ -0,0 +1,236 @@
+import argparse
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from .video_frames import DEFAULT_SAMPLE_FPS, Frame, iter_frames
+from .violence import DETECTION_THRESHOLD
+from .violence_model import DEFAULT_HOP, EMBED_BATCH, ViolenceModel
+
+QUANTIZATIONS = ('int8', 'float16')
+# Frames from the calibration videos used to fix the int8 activation ranges
+CALIBRATION_FRAMES = 200
+# Frames decoded per benchmark video, so a long file does not dominate the run
+BENCHMARK_FRAMES = 600
+
+
+def _interpreter_class():
+    """LiteRT's interpreter when ai_edge_litert is installed, else the one bundled with TensorFlow"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteEmbedder:
+    """
+    A converted (int8 / float16) per-frame CNN run through the TFLite
+    interpreter with num_threads threads. Called like the Keras embedder
+    it replaces, (n, h, w, 3) normalized frames -> (n, d) embeddings, so
+    ViolenceModel works unchanged. The interpreter is not thread-safe;
+    calls are serialized.
+    """
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self._interpreter = _interpreter_class()(model_path=path, num_threads=self.num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch = int(self._input['shape'][0])
+        self._lock = threading.Lock()
+        dtypes = {detail['dtype'] for detail in self._interpreter.get_tensor_details()}
+        self.quantization = 'int8' if np.int8 in dtypes else 'float16' if np.float16 in dtypes else 'float32'
+
+    @property
+    def input_shape(self):
+        return (None,) + tuple(int(dim) for dim in self._input['shape'][1:])
+
+    @property
+    def output_shape(self):
+        return (None,) + tuple(int(dim) for dim in self._output['shape'][1:])
+
+    def __call__(self, images, training=False):
+        images = np.asarray(images, dtype=np.float32)
+        with self._lock:
+            if len(images) != self._batch:
+                self._interpreter.resize_tensor_input(self._input['index'], (len(images),) + self.input_shape[1:])
+                self._interpreter.allocate_tensors()
+                self._input = self._interpreter.get_input_details()[0]
+                self._output = self._interpreter.get_output_details()[0]
+                self._batch = len(images)
+
+            scale, zero_point = self._input['quantization']
+            if self._input['dtype'] != np.float32 and scale:
+                images = np.round(images / scale + zero_point)
+            self._interpreter.set_tensor(self._input['index'], images.astype(self._input['dtype']))
+            self._interpreter.invoke()
+            embeddings = self._interpreter.get_tensor(self._output['index'])
+
+        scale, zero_point = self._output['quantization']
+        if self._output['dtype'] != np.float32 and scale:
+            return (embeddings.astype(np.float32) - zero_point) * scale
+        return embeddings.astype(np.float32, copy=False)
+
+
+def calibration_frames(model, video_paths, count=CALIBRATION_FRAMES, sample_fps=DEFAULT_SAMPLE_FPS):
+    """Up to count normalized frames spread over video_paths, as the int8 representative dataset"""
+    frames = []
+    per_video = max(1, count // max(len(video_paths), 1))
+    for path in video_paths:
+        frames.extend(model.normalize(frame.image)
+                      for frame in iter_frames(path, sample_fps, size=model.frame_size, max_frames=per_video))
+    return np.stack(frames[:count])
+
+
+def convert_embedder(model, output_path, quantization='int8', calibration=None):
+    """
+    Write model's per-frame CNN (ViolenceModel.embedder) as a TFLite file.
+    int8 quantizes weights and activations and needs calibration (normalized
+    frames like the ones it will see); float16 halves the weights. Inputs
+    and outputs stay float32, so the file is a drop-in for the Keras CNN.
+    """
+
+    import tensorflow as tf
+
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"quantization must be one of {', '.join(QUANTIZATIONS)}")
+    converter = tf.lite.TFLiteConverter.from_keras_model(model.embedder)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        if calibration is None or not len(calibration):
+            raise ValueError("int8 conversion needs calibration frames")
+        converter.representative_dataset = lambda: ([frame[None].astype(np.float32)] for frame in calibration)
+    with open(output_path, 'wb') as fh:
+        fh.write(converter.convert())
+    return output_path
+
+
+def _run(model, frames, hop, threshold):
+    """Embedding throughput and scored windows of one backend over already decoded frames"""
+    images = np.stack([frame.image for frame in frames])
+    model.embed(images[:EMBED_BATCH])
+    start = time.perf_counter()
+    embeddings = np.concatenate([model.embed(images[i:i + EMBED_BATCH])
+                                 for i in range(0, len(images), EMBED_BATCH)])
+    embed_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    # Fresh frames: scan stores each embedding on its frame and would reuse it for the next backend
+    windows, _ = model.scan((Frame(frame.index, frame.timestamp, frame.image) for frame in frames), hop=hop)
+    scan_seconds = time.perf_counter() - start
+    probs = np.array([window['probability'] for window in windows])
+    return {
+        'embed_fps': round(len(images) / embed_seconds, 1),
+        'scan_fps': round(len(frames) / scan_seconds, 1),
+        'windows': len(windows),
+        'violent_windows': int(np.count_nonzero(probs >= threshold))
+    }, embeddings, probs
+
+
+def benchmark(model, video_paths, quantizations=QUANTIZATIONS, num_threads=None, calibration_videos=None,
+              sample_fps=DEFAULT_SAMPLE_FPS, hop=DEFAULT_HOP, threshold=DETECTION_THRESHOLD,
+              max_frames=BENCHMARK_FRAMES):
+    """
+    Side-by-side float vs quantized comparison on the same decoded frames:
+    CNN frames/second, whole-scan frames/second, and drift against the float
+    model (embedding cosine similarity, window probability difference,
+    windows whose verdict at threshold flips). int8 is calibrated on
+    calibration_videos (default: the benchmark videos themselves).
+    """
+
+    frames = [frame for path in video_paths
+              for frame in iter_frames(path, sample_fps, size=model.frame_size, max_frames=max_frames)]
+    report = {'frames': len(frames), 'threads': num_threads or os.cpu_count() or 1, 'backends': {}}
+    baseline, reference, reference_probs = _run(model, frames, hop, threshold)
+    report['backends']['keras-float32'] = {**baseline, 'speedup': 1.0}
+
+    with tempfile.TemporaryDirectory(prefix='sia_tflite_') as workdir:
+        for quantization in quantizations:
+            calibration = None
+            if quantization == 'int8':
+                calibration = calibration_frames(model, calibration_videos or video_paths, sample_fps=sample_fps)
+            path = convert_embedder(model, os.path.join(workdir, f"embedder_{quantization}.tflite"), quantization,
+                                    calibration)
+            quantized = copy.copy(model)
+            quantized.embedder = TFLiteEmbedder(path, num_threads)
+            stats, embeddings, probs = _run(quantized, frames, hop, threshold)
+            cosine = np.sum(embeddings * reference, axis=1) / np.maximum(
+                np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1), 1e-12)
+            drift = np.abs(probs - reference_probs)
+            report['backends'][f"tflite-{quantization}"] = {
+                **stats,
+                'speedup': round(stats['embed_fps'] / baseline['embed_fps'], 2),
+                'model_bytes': os.path.getsize(path),
+                'embedding_cosine': round(float(cosine.mean()), 5),
+                'mean_probability_drift': round(float(drift.mean()), 5) if len(drift) else 0.0,
+                'max_probability_drift': round(float(drift.max()), 5) if len(drift) else 0.0,
+                'verdict_flips': int(np.count_nonzero((probs >= threshold) != (reference_probs >= threshold)))
+            }
+    return report
+
+
+def add_arguments(parser):
+    parser.add_argument('model', help="Saved Keras violence model (see SIA_VIOLENCE_MODEL)")
+    parser.add_argument('--embedder', help="Separate Keras CNN, when the model is only the LSTM head")
+    parser.add_argument('--preprocess', default='mobilenet_v2', choices=('mobilenet_v2', 'rescale', 'none'),
+                        help="Pixel scaling the model was trained with")
+    parser.add_argument('--threads', type=int, help="TFLite interpreter threads")
+    commands = parser.add_subparsers(dest='action', required=True)
+
+    convert = commands.add_parser('convert', help="Write the model's CNN as a quantized TFLite file")
+    convert.add_argument('-o', '--output', required=True, help=".tflite file to write")
+    convert.add_argument('--quantization', choices=QUANTIZATIONS, default='int8')
+    convert.add_argument('--calibrate', nargs='+', metavar='VIDEO', help="Videos whose frames calibrate int8")
+
+    bench = commands.add_parser('benchmark', help="Float vs quantized throughput and accuracy drift")
+    bench.add_argument('videos', nargs='+', help="Videos to benchmark on")
+    bench.add_argument('--quantization', choices=QUANTIZATIONS, nargs='+', default=list(QUANTIZATIONS))
+    bench.add_argument('--sample-fps', type=float, default=DEFAULT_SAMPLE_FPS, help="Frames per second analyzed")
+    bench.add_argument('--calibrate', nargs='+', metavar='VIDEO',
+                       help="Videos whose frames calibrate int8 (default: the benchmark videos)")
+    bench.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+
+def run(args):
+    model = ViolenceModel(args.model, args.embedder, preprocess=args.preprocess)
+    if args.action == 'convert':
+        if args.quantization == 'int8' and not args.calibrate:
+            raise SystemExit("int8 conversion needs --calibrate VIDEO ...")
+        calibration = calibration_frames(model, args.calibrate) if args.quantization == 'int8' else None
+        convert_embedder(model, args.output, args.quantization, calibration)
+        print(f"Wrote {args.quantization} CNN ({os.path.getsize(args.output) / 1024 / 1024:.1f} MB) -> {args.output}")
+        return
+
+    report = benchmark(model, args.videos, args.quantization, args.threads, args.calibrate, args.sample_fps)
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"{report['frames']} frames, {report['threads']} TFLite threads")
+    for name, stats in report['backends'].items():
+        line = (f"  {name:<15} CNN {stats['embed_fps']:7.1f} fps ({stats['speedup']:4.2f}x)  "
+                f"scan {stats['scan_fps']:7.1f} fps  violent windows {stats['violent_windows']}/{stats['windows']}")
+        if 'embedding_cosine' in stats:
+            line += (f"  cosine {stats['embedding_cosine']:.4f}  drift mean {stats['mean_probability_drift']:.4f} "
+                     f"max {stats['max_probability_drift']:.4f}  flips {stats['verdict_flips']}")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantized TFLite CNN for the violence model, and its benchmark")
+    add_arguments(parser)
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()